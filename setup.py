@@ -5,7 +5,7 @@ def parse_requirements(filename):
     with open(filename, 'r') as f:
         lines = f.readlines()
     # Filters out comment lines and empty lines
-    requirements = [line.strip() for line in lines if line.strip() and not line.startswith('#')]
+    requirements = [line.strip() for line in lines if line.strip() and not line.startswith(('#', '-'))]
     return requirements
 
 setup(
@@ -19,7 +19,8 @@ setup(
     url='https://github.com/H4ck3rZ0n3/social-media-opinion-analysis',  # Project URL
     packages=find_packages(where='src'),  # Directory where packages are located
     package_dir={'': 'src'},  # Root directory of the packages
-    install_requires=parse_requirements('requirements.txt'),  # Dependencies
+    install_requires=parse_requirements('requirements.txt'),  # CPU-only dependencies
+    extras_require={'cuda': parse_requirements('requirements-cuda.txt')},  # GPU backend, from https://pypi.nvidia.com
     classifiers=[
         'Programming Language :: Python :: 3',
         'License :: OSI Approved :: GNU License 3.0',  # Type of license
@@ -0,0 +1,209 @@
+# batch_controller.py
+
+import importlib
+import logging
+import os
+import sys
+import threading
+import time
+
+from compute_backend import get_backend
+from gpu_resource_manager import GPUResourceManager
+
+MEMORY_BUDGET_ENV_VAR = 'OPINION_ANALYZER_MEMORY_BUDGET_MB'
+
+# Messages of the allocation failures PyTorch raises as plain RuntimeErrors: CUDA, the default
+# CPU allocator ("not enough memory", "can't allocate memory") and the OS ("cannot allocate memory").
+_OUT_OF_MEMORY_MESSAGES = (
+    'out of memory', 'failed to allocate', 'not enough memory', "can't allocate memory", 'cannot allocate memory'
+)
+
+
+def is_out_of_memory(error):
+    if isinstance(error, MemoryError):
+        return True
+    # Only checked when torch is already loaded; a model that raised it has loaded it.
+    torch = sys.modules.get('torch')
+    out_of_memory_error = getattr(torch, 'OutOfMemoryError', None) if torch is not None else None
+    if out_of_memory_error is not None and isinstance(error, out_of_memory_error):
+        return True
+    message = str(error).lower()
+    return isinstance(error, RuntimeError) and any(text in message for text in _OUT_OF_MEMORY_MESSAGES)
+
+
+def _memory_in_use():
+    """
+    Returns the bytes currently allocated on the GPU, or the resident set size on CPU.
+    """
+    if get_backend().is_gpu:
+        return importlib.import_module('torch').cuda.memory_allocated()
+    try:
+        with open('/proc/self/statm') as file:
+            return int(file.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return 0
+
+
+class _MemorySampler:
+    def __init__(self, interval=0.002):
+        """
+        Polls _memory_in_use on a helper thread while a batch runs and reports the highest
+        value above the memory in use when it started. The process-wide peak counters are
+        not used, since they stay at the model-loading peak and are read by the metrics.
+        """
+        self.interval = interval
+        self.before = 0
+        self.highest = 0
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self.before = self.highest = _memory_in_use()
+        self._thread = threading.Thread(target=self._run, name='memory-sampler', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            self.highest = max(self.highest, _memory_in_use())
+
+    def stop(self):
+        """
+        Returns the growth seen during the call in bytes; 0 means none could be seen.
+        """
+        self._stopped.set()
+        self._thread.join()
+        self.highest = max(self.highest, _memory_in_use())
+        return self.highest - self.before
+
+
+def default_memory_budget():
+    """
+    Bytes a batch may use on top of what is already allocated: OPINION_ANALYZER_MEMORY_BUDGET_MB
+    if set, else 80% of the free GPU memory or 50% of the available system memory.
+    """
+    configured = os.environ.get(MEMORY_BUDGET_ENV_VAR)
+    if configured:
+        return int(float(configured) * (1 << 20))
+
+    if get_backend().is_gpu:
+        free, _ = importlib.import_module('torch').cuda.mem_get_info()
+        return int(free * 0.8)
+    try:
+        return int(os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE') * 0.5)
+    except (OSError, ValueError):
+        return None
+
+
+class AdaptiveBatchController:
+    def __init__(self, name, initial, minimum=1, maximum=None, memory_budget=None, probe_batches=6, min_gain=0.05):
+        """
+        Picks the batch size of one model stage at run time.
+
+        The first full batches probe the stage: while throughput improves by at least min_gain
+        and the memory measured per item says the next size fits the budget, the size doubles;
+        then it settles on the fastest size seen. Memory is sampled on a helper thread during
+        each batch; while no growth has been seen at all, the size is not grown past a budget. A batch that fails with an out-of-memory
+        error is split in half and retried, and the size is capped below the failing one, so
+        no item is dropped.
+
+        Parameters:
+        - name: Stage name used in log messages.
+        - initial: Starting batch size.
+        - minimum, maximum: Bounds of the batch size; maximum None leaves it unbounded.
+        - memory_budget: Bytes a batch may use on top of the memory in use before it; None
+          uses default_memory_budget() when the first batch runs; 0 disables the limit.
+        - probe_batches: Most batches spent probing.
+        - min_gain: Relative throughput gain needed to keep growing.
+        """
+        self.name = name
+        self.initial = initial
+        self.batch_size = initial
+        self.minimum = minimum
+        self.maximum = maximum
+        self.memory_budget = memory_budget
+        self.probe_batches = probe_batches
+        self.min_gain = min_gain
+        self.probing = True
+        self.bytes_per_item = 0.0
+        self._best = None
+        self._probes = 0
+
+    @property
+    def scale(self):
+        """
+        Current batch size relative to the initial one, e.g. to scale a token budget with it.
+        """
+        return self.batch_size / self.initial
+
+    def call(self, items, fn):
+        """
+        Returns fn(items) as a list, splitting items on out-of-memory errors until the parts
+        fit. Only a single item that does not fit raises.
+        """
+        if self.probing and self.memory_budget is None:
+            self.memory_budget = default_memory_budget()
+
+        sampler = _MemorySampler()
+        sampler.start()
+        start = time.perf_counter()
+        try:
+            outputs = list(fn(items))
+        except Exception as e:
+            sampler.stop()
+            if not is_out_of_memory(e) or len(items) <= 1:
+                raise
+            GPUResourceManager.clear_gpu_memory()
+            self._shrink(len(items))
+            half = len(items) // 2
+            return self.call(items[:half], fn) + self.call(items[half:], fn)
+
+        seconds = time.perf_counter() - start
+        self._observe(len(items), seconds, sampler.stop())
+        return outputs
+
+    def _fits(self, size):
+        if not self.memory_budget:
+            return True
+        # No growth seen yet: the batch memory is unknown, not free.
+        return self.bytes_per_item > 0 and self.bytes_per_item * size <= self.memory_budget
+
+    def _observe(self, size, seconds, used_bytes):
+        if used_bytes > 0:
+            self.bytes_per_item = max(self.bytes_per_item, used_bytes / size)
+
+        # Batches cut short by the end of the data or by a token budget say little about the size.
+        if not self.probing or size < self.batch_size // 2 or seconds <= 0:
+            return
+
+        throughput = size / seconds
+        self._probes += 1
+        if self._best is not None and throughput < self._best[1] * (1 + self.min_gain):
+            self._settle(self._best[0] if throughput < self._best[1] else self.batch_size)
+            return
+
+        self._best = (self.batch_size, throughput)
+        grown = self.batch_size * 2 if self.maximum is None else min(self.batch_size * 2, self.maximum)
+        if grown == self.batch_size or not self._fits(grown) or self._probes >= self.probe_batches:
+            self._settle(self.batch_size)
+        else:
+            self.batch_size = grown
+
+    def _settle(self, size):
+        self.batch_size = size
+        self.probing = False
+        logging.info(
+            f"Batch size of '{self.name}' settled at {size} "
+            f"({self.bytes_per_item / (1 << 20):.2f} MiB per item, budget {self._budget_text()})."
+        )
+
+    def _shrink(self, failed_size):
+        self.maximum = max(self.minimum, failed_size // 2)
+        self.batch_size = min(self.batch_size, self.maximum)
+        self.probing = False
+        logging.warning(
+            f"Out of memory in '{self.name}' with {failed_size} items; splitting the batch and "
+            f"capping the batch size at {self.maximum}."
+        )
+
+    def _budget_text(self):
+        return f"{self.memory_budget / (1 << 20):.0f} MiB" if self.memory_budget else "none"
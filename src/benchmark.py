@@ -0,0 +1,414 @@
+# benchmark.py
+
+import argparse
+import csv
+import importlib.metadata
+import json
+import logging
+import math
+import os
+import platform
+import random
+import shutil
+import statistics
+import tempfile
+import time
+import zlib
+from datetime import datetime
+
+import numpy as np
+
+import metrics
+from comment_classifier import CommentClassifier
+from compute_backend import configure_backend, get_backend
+from conclusion_generator import ConclusionGenerator
+from opinion_analyzer import OpinionAnalyzer
+from text_preprocessor import load_stop_words
+from topic_embedding_index import TopicEmbeddingIndex
+from topic_similarity_calculator import TopicSimilarityCalculator
+
+MODES = ('stub', 'real')
+_SYLLABLES = [c + v for c in 'bcdfghklmnprstvz' for v in 'aeiou']
+
+
+class _WhitespaceTokenizer:
+    """
+    Stand-in for a Hugging Face tokenizer: one token per word plus two special tokens.
+    """
+    model_max_length = 1024
+
+    def __call__(self, texts, truncation=False, max_length=None, add_special_tokens=True, **kwargs):
+        special = self.num_special_tokens_to_add() if add_special_tokens else 0
+        input_ids = []
+        for text in texts:
+            length = len(text.split()) + special
+            if truncation and max_length:
+                length = min(length, max_length)
+            input_ids.append([0] * length)
+        return {'input_ids': input_ids}
+
+    def num_special_tokens_to_add(self):
+        return 2
+
+
+class _HashingEncoder:
+    """
+    Stand-in for SentenceTransformer: signed hashed bag of words.
+    """
+    DIMENSIONS = 384
+
+    def encode(self, texts, convert_to_numpy=True, **kwargs):
+        embeddings = np.zeros((len(texts), self.DIMENSIONS), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in text.split():
+                h = zlib.crc32(word.encode('utf-8'))
+                embeddings[row, h % self.DIMENSIONS] += 1.0 if h & 1 else -1.0
+        return embeddings
+
+
+class _HashingZeroShot:
+    """
+    Stand-in for the zero-shot pipeline: picks a label from a hash of the comment.
+    """
+    tokenizer = _WhitespaceTokenizer()
+
+    def __call__(self, comments, candidate_labels, **kwargs):
+        return [
+            {'labels': [candidate_labels[zlib.crc32(comment.encode('utf-8')) % len(candidate_labels)]], 'scores': [1.0]}
+            for comment in comments
+        ]
+
+
+class _StubTopicSimilarityCalculator(TopicSimilarityCalculator):
+    MODEL_NAME = 'stub/hashing-encoder'
+
+    @property
+    def embedding_model(self):
+        return _HashingEncoder()
+
+
+class _StubCommentClassifier(CommentClassifier):
+    MODEL_NAME = 'stub/hashing-zero-shot'
+
+    @property
+    def classifier(self):
+        return _HashingZeroShot()
+
+
+class _StubConclusionGenerator(ConclusionGenerator):
+    MODEL_NAME = 'stub/leading-words'
+
+    @property
+    def tokenizer(self):
+        return _WhitespaceTokenizer()
+
+    @property
+    def summarization_model(self):
+        return None
+
+    def _summarize_batch(self, texts):
+        with metrics.timed_stage('summarize', len(texts)):
+            return [' '.join(text.split()[:30]) for text in texts]
+
+
+def _pseudo_word(rng):
+    return ''.join(rng.choice(_SYLLABLES) for _ in range(rng.randint(1, 4)))
+
+
+def synthetic_corpus(num_topics=20, num_opinions=10000, duplicate_rate=0.2, mean_words=40, length_sigma=0.6,
+                     max_words=400, vocabulary_size=5000, seed=0):
+    """
+    Returns reproducible synthetic (topics, opinions) texts.
+
+    Parameters:
+    - num_topics, num_opinions: Corpus size.
+    - duplicate_rate: Fraction of opinions copied from an earlier one; half of the copies get
+      one word replaced, so they are near-duplicates rather than exact ones.
+    - mean_words, length_sigma, max_words: Opinion lengths in words follow a log-normal
+      distribution with this median and shape, clipped to [3, max_words].
+    - vocabulary_size: Number of distinct pseudo-words. Opinions mix words of their topic,
+      of the whole vocabulary and English stopwords.
+    - seed: Seed of the generator; the same arguments always give the same corpus.
+    """
+    rng = random.Random(seed)
+    vocabulary = list(dict.fromkeys(_pseudo_word(rng) for _ in range(vocabulary_size)))
+    stop_words = sorted(load_stop_words())
+
+    topic_vocabularies = [rng.sample(vocabulary, min(50, len(vocabulary))) for _ in range(num_topics)]
+    topics = [' '.join(words[:6]).capitalize() for words in topic_vocabularies]
+
+    opinions = []
+    for _ in range(num_opinions):
+        if opinions and rng.random() < duplicate_rate:
+            words = rng.choice(opinions).split()
+            if rng.random() < 0.5:
+                words[rng.randrange(len(words))] = rng.choice(vocabulary)
+            opinions.append(' '.join(words))
+            continue
+
+        length = min(max_words, max(3, round(rng.lognormvariate(math.log(mean_words), length_sigma))))
+        own = topic_vocabularies[rng.randrange(num_topics)]
+        words = []
+        for _ in range(length):
+            draw = rng.random()
+            words.append(rng.choice(stop_words if draw < 0.3 else own if draw < 0.6 else vocabulary))
+        opinions.append(' '.join(words).capitalize() + '.')
+
+    return topics, opinions
+
+
+def corpus_stats(topics, opinions):
+    lengths = sorted(len(opinion.split()) for opinion in opinions)
+    return {
+        'topics': len(topics),
+        'opinions': len(opinions),
+        'exact_duplicate_rate': 1 - len(set(opinions)) / len(opinions) if opinions else 0.0,
+        'words': {
+            'mean': statistics.fmean(lengths) if lengths else None,
+            'p50': lengths[len(lengths) // 2] if lengths else None,
+            'p95': lengths[int(len(lengths) * 0.95)] if lengths else None,
+            'max': lengths[-1] if lengths else None,
+        },
+    }
+
+
+def write_corpus(directory, topics, opinions):
+    """
+    Writes topics.csv and opinions.csv with a 'text' column and returns their paths.
+    """
+    paths = []
+    for name, texts in (('topics', topics), ('opinions', opinions)):
+        path = os.path.join(directory, f'{name}.csv')
+        with open(path, 'w', newline='', encoding='utf-8') as file:
+            writer = csv.writer(file)
+            writer.writerow(['text'])
+            writer.writerows([text] for text in texts)
+        paths.append(path)
+    return paths
+
+
+def _environment():
+    backend = get_backend()
+    versions = {}
+    for package in ('numpy', 'pandas', 'pyarrow', 'torch', 'transformers', 'sentence-transformers'):
+        try:
+            versions[package] = importlib.metadata.version(package)
+        except importlib.metadata.PackageNotFoundError:
+            versions[package] = None
+
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'backend': {'device': str(backend.device), 'is_gpu': backend.is_gpu, 'num_threads': backend.num_threads},
+        'packages': versions,
+    }
+
+
+def build_analyzer(mode, work_dir, **analyzer_options):
+    """
+    Returns an OpinionAnalyzer without result cache writing into work_dir, with its topic
+    index cached in work_dir too, so no run reuses results of an earlier one. In stub mode its
+    models are replaced by cheap hashing stand-ins, so timings measure the pipeline itself.
+    """
+    if mode not in MODES:
+        raise ValueError(f"Unknown benchmark mode: {mode}. Expected one of {MODES}.")
+
+    analyzer = OpinionAnalyzer(result_cache=False, output_dir=os.path.join(work_dir, 'outputs'), **analyzer_options)
+
+    if mode == 'stub':
+        if analyzer_options.get('first_stage', 'centroid') != 'centroid':
+            raise ValueError("Stub mode supports the centroid first stage only.")
+
+        classifier, generator = analyzer.comment_classifier, analyzer.conclusion_generator
+        calculator = analyzer.similarity_calculator
+        analyzer.similarity_calculator = _StubTopicSimilarityCalculator(
+            index_cache_dir=os.path.join(work_dir, 'topic_index'),
+            min_similarity=calculator.min_similarity
+        )
+        analyzer.similarity_calculator.search_engine = calculator.search_engine
+        analyzer.comment_classifier = _StubCommentClassifier(
+            mode=classifier.mode,
+            first_stage='centroid',
+            escalation_threshold=classifier.escalation_threshold,
+            encoder=analyzer.similarity_calculator,
+            preprocessor=analyzer.preprocessor
+        )
+        analyzer.conclusion_generator = _StubConclusionGenerator(mode=generator.mode, encoder=analyzer.similarity_calculator)
+    else:
+        calculator = analyzer.similarity_calculator
+        calculator.topic_index = TopicEmbeddingIndex(
+            lambda: calculator.embedding_model, calculator.cache_config, os.path.join(work_dir, 'topic_index')
+        )
+    return analyzer
+
+
+def _stage_benchmarks(analyzer, topics, opinions, batch_size, summary_sample_size):
+    metrics.reset()
+    topics = analyzer.preprocess_texts(topics)
+    opinions = analyzer.preprocess_texts(opinions)
+    representatives, _, _ = analyzer.collapse_opinions(opinions)
+
+    calculator = analyzer.similarity_calculator
+    for start in range(0, len(representatives), batch_size):
+        batch = representatives[start:start + batch_size]
+        embeddings = calculator.encode_comments(batch)
+        calculator.search_topics_batch(batch, topics, k=1, comment_embeddings=embeddings)
+        analyzer.comment_classifier.classify_comments_batch(batch, embeddings=embeddings)
+
+    analyzer.conclusion_generator.summarize_texts(representatives[:summary_sample_size])
+    return metrics.run_report()['stages']
+
+
+def _latency_summary(latencies):
+    latencies = sorted(latencies)
+    return {
+        'mean': statistics.fmean(latencies),
+        'p50': latencies[len(latencies) // 2],
+        'p95': latencies[int(len(latencies) * 0.95)],
+        'max': latencies[-1],
+    }
+
+
+def run_benchmark(mode='stub', num_topics=20, num_opinions=10000, duplicate_rate=0.2, mean_words=40,
+                  length_sigma=0.6, batch_size=8192, summary_sample_size=256, grpc_requests=50,
+                  grpc_request_size=32, seed=0, work_dir=None, **analyzer_options):
+    """
+    Benchmarks the stages, analyze_csv and analyze_grpc on a synthetic corpus and returns a
+    JSON-ready report.
+
+    Parameters:
+    - mode: 'stub' replaces the models with hashing stand-ins to measure pipeline overhead;
+      'real' runs the actual models.
+    - num_topics, num_opinions, duplicate_rate, mean_words, length_sigma, seed: Corpus, see
+      synthetic_corpus.
+    - batch_size: Opinions per batch of the isolated stage runs.
+    - summary_sample_size: Opinions summarized in the isolated summarize stage.
+    - grpc_requests, grpc_request_size: Number and size of the analyze_grpc calls.
+    - work_dir: Directory of the corpus CSVs and outputs; a temporary directory
+      removed afterwards if omitted.
+    - analyzer_options: Passed to OpinionAnalyzer (classification_mode, summarization_mode,
+      collapse_near_duplicates, quantize...).
+    """
+    config = dict(
+        mode=mode, num_topics=num_topics, num_opinions=num_opinions, duplicate_rate=duplicate_rate,
+        mean_words=mean_words, length_sigma=length_sigma, batch_size=batch_size,
+        summary_sample_size=summary_sample_size, grpc_requests=grpc_requests,
+        grpc_request_size=grpc_request_size, seed=seed,
+        **{name: str(value) for name, value in analyzer_options.items()}
+    )
+    topics, opinions = synthetic_corpus(num_topics, num_opinions, duplicate_rate, mean_words, length_sigma, seed=seed)
+
+    temporary = work_dir is None
+    work_dir = work_dir or tempfile.mkdtemp(prefix='opinion_benchmark_')
+    try:
+        topic_path, opinion_path = write_corpus(work_dir, topics, opinions)
+        analyzer = build_analyzer(mode, work_dir, **analyzer_options)
+
+        start = time.perf_counter()
+        analyzer.similarity_calculator.load()
+        analyzer.comment_classifier.load()
+        analyzer.conclusion_generator.load()
+        model_load_seconds = time.perf_counter() - start
+
+        logging.info("Benchmarking the stages...")
+        stages = _stage_benchmarks(analyzer, topics, opinions, batch_size, summary_sample_size)
+
+        logging.info("Benchmarking analyze_csv...")
+        metrics.reset()
+        start = time.perf_counter()
+        analyzer.analyze_csv(topic_path, opinion_path)
+        csv_seconds = time.perf_counter() - start
+        csv_stages = metrics.run_report()['stages']
+
+        logging.info("Benchmarking analyze_grpc...")
+        metrics.reset()
+        rng = random.Random(seed)
+        latencies = []
+        for _ in range(grpc_requests):
+            offset = rng.randrange(max(1, len(opinions) - grpc_request_size + 1))
+            start = time.perf_counter()
+            analyzer.analyze_grpc(topics, opinions[offset:offset + grpc_request_size])
+            latencies.append(time.perf_counter() - start)
+        grpc_stages = metrics.run_report()['stages']
+    finally:
+        if temporary:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    grpc_seconds = sum(latencies)
+    return {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'config': config,
+        'environment': _environment(),
+        'corpus': corpus_stats(topics, opinions),
+        'model_load_seconds': model_load_seconds,
+        'stages': stages,
+        'analyze_csv': {
+            'seconds': csv_seconds,
+            'opinions_per_second': num_opinions / csv_seconds if csv_seconds else None,
+            'stages': csv_stages,
+        },
+        'analyze_grpc': {
+            'requests': grpc_requests,
+            'request_size': grpc_request_size,
+            'seconds': grpc_seconds,
+            'requests_per_second': grpc_requests / grpc_seconds if grpc_seconds else None,
+            'latency_seconds': _latency_summary(latencies) if latencies else None,
+            'stages': grpc_stages,
+        },
+    }
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description="Benchmark the analysis pipeline on a synthetic corpus.")
+    parser.add_argument('--mode', choices=MODES, default='stub')
+    parser.add_argument('--backend', default='cpu', help="'cpu', 'cuda' or 'auto'.")
+    parser.add_argument('--topics', type=int, default=20)
+    parser.add_argument('--opinions', type=int, default=None, help="Default: 10000 in stub mode, 300 in real mode.")
+    parser.add_argument('--duplicate-rate', type=float, default=0.2)
+    parser.add_argument('--mean-words', type=float, default=40)
+    parser.add_argument('--length-sigma', type=float, default=0.6)
+    parser.add_argument('--batch-size', type=int, default=8192)
+    parser.add_argument('--summary-sample-size', type=int, default=None, help="Default: 256 stub, 16 real.")
+    parser.add_argument('--grpc-requests', type=int, default=None, help="Default: 50 stub, 5 real.")
+    parser.add_argument('--grpc-request-size', type=int, default=32)
+    parser.add_argument('--classification-mode', default='zero-shot')
+    parser.add_argument('--summarization-mode', default='comment')
+    parser.add_argument('--collapse-near-duplicates', action='store_true')
+    parser.add_argument('--search-mode', default='exact', help="'exact' or 'ann'.")
+    parser.add_argument('--min-similarity', type=float, default=None)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default=None, help="Default: outputs/benchmark_<mode>_<timestamp>.json.")
+    args = parser.parse_args()
+
+    real = args.mode == 'real'
+    configure_backend(args.backend)
+
+    report = run_benchmark(
+        mode=args.mode,
+        num_topics=args.topics,
+        num_opinions=args.opinions or (300 if real else 10000),
+        duplicate_rate=args.duplicate_rate,
+        mean_words=args.mean_words,
+        length_sigma=args.length_sigma,
+        batch_size=args.batch_size,
+        summary_sample_size=args.summary_sample_size or (16 if real else 256),
+        grpc_requests=args.grpc_requests or (5 if real else 50),
+        grpc_request_size=args.grpc_request_size,
+        seed=args.seed,
+        classification_mode=args.classification_mode,
+        summarization_mode=args.summarization_mode,
+        collapse_near_duplicates=args.collapse_near_duplicates,
+        search_mode=args.search_mode,
+        min_similarity=args.min_similarity
+    )
+
+    output = args.output or os.path.join('outputs', f"benchmark_{args.mode}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    output_dir = os.path.dirname(output)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as file:
+        json.dump(report, file, indent=2)
+    print(f"Benchmark report saved to {output}.")
@@ -0,0 +1,109 @@
+# checkpoint_store.py
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+
+
+def file_fingerprint(paths, config=''):
+    """
+    Returns a sha256 over the contents of the input files and a configuration string, so a
+    checkpoint is only reused for the same inputs processed the same way.
+    """
+    digest = hashlib.sha256(config.encode('utf-8'))
+    for path in paths:
+        digest.update(b'\0')
+        with open(path, 'rb') as file:
+            for block in iter(lambda: file.read(1 << 20), b''):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+def run_batches(total, batch_size, compute, checkpoint=None, stage=None, is_complete=None, on_batch=None):
+    """
+    Calls compute(start, end) for consecutive ranges of batch_size items and returns the
+    concatenated results. With a checkpoint, ranges recorded for stage by an earlier run are
+    read back instead of computed, and every newly computed range is recorded before moving on.
+    Outputs for which is_complete(outputs) is false (e.g. a batch whose model call failed) are
+    returned but not recorded, so a resumed run computes them again. With on_batch, the
+    outputs of every range are passed to on_batch(start, end, outputs) in order instead of
+    being kept, and None is returned.
+    """
+    completed = checkpoint.completed(stage) if checkpoint is not None else {}
+    if completed:
+        logging.info(f"Resuming stage '{stage}': {len(completed)} batch(es) already completed.")
+
+    results = []
+    for start in range(0, total, batch_size):
+        end = min(start + batch_size, total)
+        outputs = completed.get((start, end))
+        if outputs is None:
+            outputs = compute(start, end)
+            if checkpoint is not None:
+                if is_complete is None or is_complete(outputs):
+                    checkpoint.record(stage, start, end, outputs)
+                else:
+                    logging.warning(f"Batch {start}-{end} of stage '{stage}' is incomplete; not recording it.")
+        if on_batch is not None:
+            on_batch(start, end, outputs)
+        else:
+            results.extend(outputs)
+    return results if on_batch is None else None
+
+
+class CheckpointStore:
+    def __init__(self, path):
+        """
+        Durable record of the completed batch ranges of a run and their outputs, one SQLite
+        file per input fingerprint. Outputs must be JSON serializable.
+
+        Parameters:
+        - path: SQLite file; created if missing.
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.path = path
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS batches ("
+            "stage TEXT NOT NULL, start INTEGER NOT NULL, end INTEGER NOT NULL, outputs TEXT NOT NULL, "
+            "PRIMARY KEY (stage, start, end))"
+        )
+        self._db.commit()
+
+    @classmethod
+    def open(cls, checkpoint_dir, input_paths, config=''):
+        fingerprint = file_fingerprint(input_paths, config)
+        store = cls(os.path.join(checkpoint_dir, f'{fingerprint}.sqlite'))
+        logging.info(f"Checkpointing to {store.path}.")
+        return store
+
+    def completed(self, stage):
+        """
+        Returns {(start, end): outputs} for the ranges of stage recorded so far.
+        """
+        rows = self._db.execute("SELECT start, end, outputs FROM batches WHERE stage = ?", (stage,))
+        return {(start, end): json.loads(outputs) for start, end, outputs in rows}
+
+    def record(self, stage, start, end, outputs):
+        with self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO batches VALUES (?, ?, ?, ?)", (stage, start, end, json.dumps(outputs))
+            )
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def remove(self):
+        """
+        Closes the store and deletes its file once the run's outputs are saved.
+        """
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
@@ -0,0 +1,204 @@
+# classified_comments.py
+
+import numpy as np
+
+
+def _encode(values, vocabulary):
+    """
+    Returns int32 codes for values, extending vocabulary (a list of distinct values) in order
+    of first appearance. None is coded as -1.
+    """
+    positions = {value: code for code, value in enumerate(vocabulary)}
+    codes = np.empty(len(values), dtype=np.int32)
+    for i, value in enumerate(values):
+        if value is None:
+            codes[i] = -1
+            continue
+        code = positions.get(value)
+        if code is None:
+            code = positions[value] = len(vocabulary)
+            vocabulary.append(value)
+        codes[i] = code
+    return codes
+
+
+class ClassifiedComments:
+    def __init__(self, texts=(), topic_codes=None, type_codes=None, topics=(), types=(), counts=None,
+                 members=None, cluster_of=None):
+        """
+        Columnar store of classified comments. Topics and types are kept as integer codes into
+        the topics and types vocabularies (-1 for none), so each distinct string is held once.
+
+        Parameters:
+        - texts: Comment texts (cluster representatives when near-duplicates were collapsed).
+        - topic_codes, type_codes: Integer codes, one per text.
+        - topics, types: Vocabularies decoding the codes.
+        - counts: Opinions each text stands for; defaults to 1 each.
+        - members: Optional list with the member texts of each collapsed cluster.
+        - cluster_of: Optional index into texts of every original opinion, in input order, so
+          expanded rows come back in input order rather than cluster by cluster.
+        """
+        self.texts = list(texts)
+        size = len(self.texts)
+        self.topic_codes = np.full(size, -1, np.int32) if topic_codes is None else np.asarray(topic_codes, np.int32)
+        self.type_codes = np.full(size, -1, np.int32) if type_codes is None else np.asarray(type_codes, np.int32)
+        self.topics = list(topics)
+        self.types = list(types)
+        self.counts = np.ones(size, np.int64) if counts is None else np.asarray(counts, np.int64)
+        self.members = members
+        self.cluster_of = None if cluster_of is None else np.asarray(cluster_of, np.int64)
+        self._topic_index = None
+
+    @classmethod
+    def from_columns(cls, texts, topics, types, members=None, cluster_of=None):
+        """
+        Builds the store from parallel lists of texts, topics and types. members, if given,
+        lists each text's cluster members (None for a text that stands only for itself), and
+        cluster_of the cluster of every original opinion as NearDuplicateDetector.cluster returns it.
+        """
+        topic_vocabulary = []
+        type_vocabulary = []
+        topic_codes = _encode(topics, topic_vocabulary)
+        type_codes = _encode(types, type_vocabulary)
+
+        counts = None
+        if members is not None and any(m is not None for m in members):
+            counts = [len(m) if m is not None else 1 for m in members]
+        else:
+            members = cluster_of = None
+
+        return cls(texts, topic_codes, type_codes, topic_vocabulary, type_vocabulary, counts, members, cluster_of)
+
+    @classmethod
+    def from_rows(cls, rows):
+        rows = list(rows)
+        return cls.from_columns(
+            [text for text, _, _ in rows], [topic for _, topic, _ in rows], [t for _, _, t in rows]
+        )
+
+    @classmethod
+    def concat(cls, parts, members=None, cluster_of=None):
+        """
+        Concatenates parts in order, remapping their codes onto shared vocabularies that keep
+        the order of first appearance. members and cluster_of optionally replace those of the
+        result.
+        """
+        texts = []
+        topic_vocabulary = []
+        type_vocabulary = []
+        topic_codes = []
+        type_codes = []
+        counts = []
+        clusters = []
+        for part in parts:
+            if part.cluster_of is not None:
+                clusters.append(part.cluster_of + len(texts))
+            else:
+                clusters.append(np.repeat(np.arange(len(texts), len(texts) + len(part)), part.counts))
+            texts.extend(part.texts)
+            for codes, vocabulary, merged_vocabulary, merged_codes in (
+                    (part.topic_codes, part.topics, topic_vocabulary, topic_codes),
+                    (part.type_codes, part.types, type_vocabulary, type_codes)):
+                remap = np.append(_encode(vocabulary, merged_vocabulary), -1).astype(np.int32)
+                merged_codes.append(remap[codes])  # Code -1 picks the appended -1.
+            counts.append(part.counts)
+
+        if members is not None:
+            counts = [len(m) if m is not None else 1 for m in members]
+        else:
+            counts = np.concatenate(counts) if counts else None
+            if any(part.members is not None for part in parts):
+                members = [
+                    part.members[i] if part.members is not None else None
+                    for part in parts for i in range(len(part))
+                ]
+            if cluster_of is None and any(part.cluster_of is not None for part in parts):
+                cluster_of = np.concatenate(clusters)
+
+        return cls(
+            texts,
+            np.concatenate(topic_codes) if topic_codes else None,
+            np.concatenate(type_codes) if type_codes else None,
+            topic_vocabulary, type_vocabulary, counts, members, cluster_of
+        )
+
+    def __len__(self):
+        return len(self.texts)
+
+    @property
+    def total_count(self):
+        return int(self.counts.sum())
+
+    def expanded_order(self):
+        """
+        Returns the index into texts of every opinion, expanding collapsed clusters: in input
+        order when cluster_of is known, else cluster by cluster.
+        """
+        if self.cluster_of is not None:
+            return self.cluster_of
+        return np.repeat(np.arange(len(self.texts)), self.counts)
+
+    def expanded_texts(self):
+        """
+        Returns the text of every opinion in the order of expanded_order.
+        """
+        if self.members is None:
+            return list(self.texts)
+        if self.cluster_of is None:
+            return [member for text, members in zip(self.texts, self.members) for member in members or (text,)]
+
+        # Members list their cluster's opinions in input order, so each opinion takes the next
+        # unused member of its cluster.
+        next_member = [0] * len(self.texts)
+        texts = []
+        for i in self.cluster_of.tolist():
+            members = self.members[i]
+            texts.append(members[next_member[i]] if members else self.texts[i])
+            next_member[i] += 1
+        return texts
+
+    def rows(self):
+        """
+        Yields (text, topic, type) for every opinion, expanding collapsed clusters, in input
+        order when cluster_of is known.
+        """
+        topics = self.topics + [None]  # Code -1 picks the appended None.
+        types = self.types + [None]
+        order = self.expanded_order()
+        for text, topic_code, type_code in zip(
+                self.expanded_texts(), self.topic_codes[order].tolist(), self.type_codes[order].tolist()):
+            yield text, topics[topic_code], types[type_code]
+
+    def topic_index(self):
+        """
+        Returns (order, offsets): the indices of the comments that have a topic, sorted by topic
+        code (stable), and offsets such that order[offsets[c]:offsets[c + 1]] are topic c's.
+        """
+        if self._topic_index is None:
+            with_topic = np.flatnonzero(self.topic_codes >= 0)
+            codes = self.topic_codes[with_topic]
+            order = with_topic[np.argsort(codes, kind='stable')]
+            offsets = np.zeros(len(self.topics) + 1, np.int64)
+            np.cumsum(np.bincount(codes, minlength=len(self.topics)), out=offsets[1:])
+            self._topic_index = order, offsets
+        return self._topic_index
+
+    def topic_groups(self):
+        """
+        Yields (topic_code, topic, indices) for every topic with comments, in order of first
+        appearance. Comments without a topic are left out.
+        """
+        order, offsets = self.topic_index()
+        for code, topic in enumerate(self.topics):
+            if offsets[code + 1] > offsets[code]:
+                yield code, topic, order[offsets[code]:offsets[code + 1]]
+
+    def type_count_matrix(self):
+        """
+        Returns a (topics x types) matrix counting the opinions of each type per topic, each
+        comment weighted by the opinions it stands for.
+        """
+        valid = (self.topic_codes >= 0) & (self.type_codes >= 0)
+        cells = self.topic_codes[valid].astype(np.int64) * len(self.types) + self.type_codes[valid]
+        matrix = np.bincount(cells, weights=self.counts[valid], minlength=len(self.topics) * len(self.types))
+        return matrix.astype(np.int64).reshape(len(self.topics), len(self.types))
@@ -2,27 +2,137 @@
 
 import logging
 
-from transformers import pipeline
+from transformers import AutoModelForSequenceClassification, pipeline
 
+from batch_controller import AdaptiveBatchController
+from compute_backend import get_backend
+from first_stage_classifier import CentroidCommentClassifier, DistilledNLIClassifier
 from gpu_resource_manager import GPUResourceManager
+from metrics import timed_stage
+from model_registry import get_model
+from quantization import load_quantized
+from length_batcher import LengthBucketBatcher
 
 
 class CommentClassifier:
-    def __init__(self):
-        logging.info("Loading zero-shot classification model on CUDA...")
-        self.classifier = pipeline(
-            "zero-shot-classification",
-            model="facebook/bart-large-mnli",
-            device='cuda',
-            batch_size=384
+    LABELS = ["Claim", "Counterclaim", "Rebuttal", "Evidence"]
+    MODES = ('zero-shot', 'cascade')
+
+    MODEL_NAME = "facebook/bart-large-mnli"
+
+    def __init__(self, mode='zero-shot', first_stage='centroid', escalation_threshold=0.6, encoder=None,
+                 max_batch_tokens=65536, max_batch_size=96, result_cache=None, quantize=False,
+                 adaptive_batching=True, preprocessor=None):
+        """
+        Parameters:
+        - mode: 'zero-shot' runs bart-large-mnli on every comment. 'cascade' labels comments
+          with a cheap first stage and only escalates low-confidence ones to bart-large-mnli.
+        - first_stage: 'centroid' (MiniLM embedding centroids, needs encoder) or 'nli'
+          (a distilled NLI model).
+        - escalation_threshold: Comments whose first-stage confidence is below this value
+          are escalated.
+        - encoder: The TopicSimilarityCalculator whose embeddings the centroid stage reuses.
+        - max_batch_tokens: Padded token budget of one bart-large-mnli forward pass, counting
+          one row per (comment, label) pair.
+        - max_batch_size: Most comments per forward pass; the starting size with adaptive batching.
+        - result_cache: Optional ResultCache reused for labels.
+        - quantize: Run bart-large-mnli with int8 dynamic quantization (CPU only).
+        - adaptive_batching: Tune max_batch_size and max_batch_tokens together at run time
+          within the memory budget, and split batches that run out of memory. See
+          AdaptiveBatchController.
+        - preprocessor: The TextPreprocessor the comments went through; the centroid stage
+          preprocesses its prototypes with it.
+        """
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown classification mode: {mode}. Expected one of {self.MODES}.")
+
+        self.device = get_backend().device
+        self.max_batch_tokens = max_batch_tokens
+        self.max_batch_size = max_batch_size
+        self.batch_controller = AdaptiveBatchController(
+            'classify', max_batch_size, maximum=16 * max_batch_size
+        ) if adaptive_batching else None
+        self.quantize = quantize
+        self._batcher = None
+
+        self.mode = mode
+        self.escalation_threshold = escalation_threshold
+        self.first_stage = None
+        self.stage_counts = {'first_stage': 0, 'escalated': 0}
+        # Off while warming up and in sharded workers, so those comments neither refit the
+        # first stage nor count towards the stage hit rates.
+        self.learning = True
+        self.result_cache = result_cache
+        self.cache_config = f"{self.MODEL_NAME}|{','.join(self.LABELS)}|{mode}"
+        if quantize:
+            self.cache_config += "|int8"
+        if mode == 'cascade':
+            self.cache_config += f"|{first_stage}|{escalation_threshold}"
+            if first_stage == 'centroid':
+                # The centroids are refit from escalated labels, so labels depend on what came before.
+                self.cache_config += "|refit"
+
+        if mode == 'cascade':
+            if first_stage == 'centroid':
+                if encoder is None:
+                    raise ValueError("The centroid first stage needs an encoder.")
+                self.first_stage = CentroidCommentClassifier(encoder, self.LABELS, preprocessor=preprocessor)
+            elif first_stage == 'nli':
+                self.first_stage = DistilledNLIClassifier(self.LABELS)
+            else:
+                raise ValueError(f"Unknown first stage: {first_stage}. Expected 'centroid' or 'nli'.")
+
+    @property
+    def classifier(self):
+        if self.quantize:
+            return get_model(
+                ('zero-shot-classification', self.MODEL_NAME, 'int8'),
+                lambda: pipeline(
+                    "zero-shot-classification",
+                    model=load_quantized(
+                        self.MODEL_NAME, lambda: AutoModelForSequenceClassification.from_pretrained(self.MODEL_NAME)
+                    ),
+                    tokenizer=self.MODEL_NAME,
+                    device='cpu',
+                    batch_size=384
+                )
+            )
+        return get_model(
+            ('zero-shot-classification', self.MODEL_NAME, self.device),
+            lambda: pipeline("zero-shot-classification", model=self.MODEL_NAME, device=self.device, batch_size=384)
         )
 
-    def classify_comments_batch(self, comments):
+    @property
+    def batcher(self):
+        if self._batcher is None:
+            tokenizer = self.classifier.tokenizer
+            self._batcher = LengthBucketBatcher(
+                tokenizer,
+                max_tokens=self.max_batch_tokens,
+                max_batch_size=self.max_batch_size,
+                max_length=tokenizer.model_max_length,
+                items_per_text=len(self.LABELS),
+                controller=self.batch_controller
+            )
+        return self._batcher
+
+    def load(self):
+        """
+        Loads every model this classifier uses instead of waiting for the first batch.
+        """
+        self.batcher
+        if self.first_stage is not None:
+            self.first_stage.load()
+
+    def classify_comments_batch(self, comments, embeddings=None):
+        """
+        Returns one label per comment. If classification fails, every label is None, so the
+        result still lines up with comments; batches that run out of memory are split and
+        retried instead.
+        """
         if not all(isinstance(comment, str) and comment for comment in comments):
             logging.error("All comments must be non-empty strings.")
-            return []
-
-        labels = ["Claim", "Counterclaim", "Rebuttal", "Evidence"]
+            return [None] * len(comments)
 
         if not comments:
             logging.warning("No comments to classify in this batch.")
@@ -31,21 +141,75 @@ class CommentClassifier:
         logging.info(f"Classifying batch of {len(comments)} comments...")
 
         try:
-            results = self.classifier(comments, candidate_labels=labels)
-            classifications = [result['labels'][0] for result in results]
+            with timed_stage('classify', len(comments)):
+                if self.result_cache is None:
+                    classifications = self._classify(comments, embeddings)
+                else:
+                    classifications = self.result_cache.get_or_compute(
+                        'label', comments, self.cache_config,
+                        lambda indices: self._classify(
+                            [comments[i] for i in indices],
+                            None if embeddings is None else embeddings[indices]
+                        )
+                    )
             logging.info("Comment classification completed.")
             return classifications
 
         except ValueError as ve:
             logging.error(f"ValueError occurred: {ve}")
-            return []
+            return [None] * len(comments)
         except Exception as e:
             logging.error(f"Unexpected error occurred during classification: {e}")
-            return []
+            return [None] * len(comments)
         finally:
             try:
-                del results
                 GPUResourceManager.clear_gpu_memory()
                 logging.info("Memory cleanup completed.")
             except Exception as cleanup_error:
                 logging.warning(f"Cleanup error: {cleanup_error}")
+
+    def _classify(self, comments, embeddings):
+        if self.mode == 'cascade':
+            return self._classify_cascade(comments, embeddings)
+        return self._classify_zero_shot(comments)
+
+    def _classify_zero_shot(self, comments):
+        return self.batcher.run(comments, self._classify_zero_shot_batch)
+
+    def _classify_zero_shot_batch(self, comments):
+        results = self.classifier(
+            comments,
+            candidate_labels=self.LABELS,
+            batch_size=len(comments) * len(self.LABELS)
+        )
+        return [result['labels'][0] for result in results]
+
+    def _classify_cascade(self, comments, embeddings):
+        classifications, confidences = self.first_stage.predict(comments, embeddings)
+
+        escalated = [i for i, confidence in enumerate(confidences) if confidence < self.escalation_threshold]
+        if escalated:
+            escalated_labels = self._classify_zero_shot([comments[i] for i in escalated])
+            for i, label in zip(escalated, escalated_labels):
+                classifications[i] = label
+            if self.learning:
+                self.first_stage.update(
+                    [comments[i] for i in escalated],
+                    escalated_labels,
+                    None if embeddings is None else embeddings[escalated]
+                )
+
+        if self.learning:
+            self.stage_counts['first_stage'] += len(comments) - len(escalated)
+            self.stage_counts['escalated'] += len(escalated)
+        logging.info(
+            f"Cascade: {len(comments) - len(escalated)} comments labeled by the first stage, "
+            f"{len(escalated)} escalated."
+        )
+        return classifications
+
+    def stage_hit_rates(self):
+        total = sum(self.stage_counts.values())
+        if not total:
+            return {stage: 0.0 for stage in self.stage_counts}
+        return {stage: count / total for stage, count in self.stage_counts.items()}
@@ -0,0 +1,130 @@
+# compute_backend.py
+
+import importlib
+import logging
+import os
+import threading
+
+BACKEND_ENV_VAR = 'OPINION_ANALYZER_BACKEND'
+THREADS_ENV_VAR = 'OPINION_ANALYZER_THREADS'
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+class ComputeBackend:
+    NAMES = ('cuda', 'cpu')
+
+    def __init__(self, name, num_threads=None):
+        """
+        Array and dataframe modules plus the torch device used by the whole pipeline.
+
+        Parameters:
+        - name: 'cuda' (CuPy/cuDF on the GPU) or 'cpu' (NumPy/pandas).
+        - num_threads: Intra-op thread count for the CPU backend. Defaults to all cores.
+        """
+        if name not in self.NAMES:
+            raise ValueError(f"Unknown compute backend: {name}. Expected one of {self.NAMES}.")
+
+        self.name = name
+        self.device = name
+        self.num_threads = None
+
+        if name == 'cpu':
+            self._configure_threads(num_threads)
+            self.xp = importlib.import_module('numpy')
+            self.df = importlib.import_module('pandas')
+        else:
+            self.xp = importlib.import_module('cupy')
+            self.df = importlib.import_module('cudf')
+
+    @property
+    def is_gpu(self):
+        return self.name == 'cuda'
+
+    def _configure_threads(self, num_threads):
+        num_threads = int(num_threads or os.environ.get(THREADS_ENV_VAR) or os.cpu_count() or 1)
+        self.num_threads = num_threads
+
+        # Only takes effect for BLAS pools that are not initialized yet.
+        for var in ('OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS'):
+            os.environ.setdefault(var, str(num_threads))
+
+        try:
+            torch = importlib.import_module('torch')
+            torch.set_num_threads(num_threads)
+        except ImportError:
+            pass
+
+        logging.info(f"CPU backend using {num_threads} threads.")
+
+    def asarray(self, array):
+        if not self.is_gpu and hasattr(array, 'detach'):
+            array = array.detach().cpu().numpy()
+        return self.xp.asarray(array)
+
+    def asnumpy(self, array):
+        if self.is_gpu:
+            return self.xp.asnumpy(array)
+        return array
+
+    def read_csv(self, path, **kwargs):
+        return self.df.read_csv(path, **kwargs)
+
+    def read_csv_chunks(self, path, column, chunk_size):
+        """
+        Yields the values of one column, chunk_size rows at a time. Always read through pandas,
+        since cuDF cannot read a file incrementally.
+        """
+        pandas = importlib.import_module('pandas')
+        for chunk in pandas.read_csv(path, usecols=[column], chunksize=chunk_size):
+            yield chunk[column].tolist()
+
+    def column_to_list(self, df, column):
+        series = df[column]
+        if self.is_gpu:
+            series = series.to_pandas()
+        return series.tolist()
+
+    def free_memory(self):
+        if not self.is_gpu:
+            return False
+        self.xp.get_default_memory_pool().free_all_blocks()
+        self.xp.get_default_pinned_memory_pool().free_all_blocks()
+        return True
+
+
+def _detect_backend_name():
+    try:
+        torch = importlib.import_module('torch')
+        importlib.import_module('cupy')
+        importlib.import_module('cudf')
+        if torch.cuda.is_available():
+            return 'cuda'
+    except ImportError:
+        pass
+    return 'cpu'
+
+
+def configure_backend(name=None, num_threads=None):
+    """
+    Selects the process-wide backend. name may be 'cuda', 'cpu' or 'auto'; when omitted it
+    is read from the OPINION_ANALYZER_BACKEND environment variable, defaulting to 'auto'.
+    """
+    global _backend
+
+    name = (name or os.environ.get(BACKEND_ENV_VAR) or 'auto').lower()
+    if name == 'auto':
+        name = _detect_backend_name()
+
+    with _backend_lock:
+        _backend = ComputeBackend(name, num_threads)
+
+    logging.info(f"Compute backend: {name}.")
+    return _backend
+
+
+def get_backend():
+    if _backend is None:
+        return configure_backend()
+    return _backend
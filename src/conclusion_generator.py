@@ -1,52 +1,254 @@
 # conclusion_generator.py
 
 import logging
-from collections import defaultdict
 
+import numpy as np
 from transformers import BartTokenizer, BartForConditionalGeneration
 
+from batch_controller import AdaptiveBatchController
+from checkpoint_store import run_batches
+from compute_backend import get_backend
 from gpu_resource_manager import GPUResourceManager
+from metrics import timed_stage
+from model_registry import get_model
+from quantization import load_quantized
+from length_batcher import LengthBucketBatcher
 from topic_effectiveness_classifier import TopicEffectivenessClassifier
 
 
 class ConclusionGenerator:
-    def __init__(self):
-        self.tokenizer = BartTokenizer.from_pretrained("facebook/bart-large-cnn")
-        self.summarization_model = BartForConditionalGeneration.from_pretrained(
-            "facebook/bart-large-cnn"
-        ).to('cuda')
+    MODES = ('comment', 'topic')
+
+    MODEL_NAME = "facebook/bart-large-cnn"
+
+    CHECKPOINT_INTERVAL = 16
+
+    def __init__(self, mode='comment', encoder=None, max_input_tokens=1024, max_candidates=2048,
+                 duplicate_threshold=0.95, max_batch_tokens=65536, result_cache=None, quantize=False,
+                 adaptive_batching=True, initial_batch_size=64):
+        """
+        Parameters:
+        - mode: 'comment' summarizes every comment separately. 'topic' produces one summary per
+          topic from a representative, deduplicated subset of its comments.
+        - encoder: The TopicSimilarityCalculator used to rank comments in topic mode.
+        - max_input_tokens: Token budget of the summarizer input.
+        - max_candidates: Most comments per topic considered when picking representatives.
+        - duplicate_threshold: Cosine similarity above which a comment counts as a duplicate
+          of an already selected one.
+        - max_batch_tokens: Padded token budget of one generate call.
+        - result_cache: Optional ResultCache reused for summaries.
+        - quantize: Run bart-large-cnn with int8 dynamic quantization (CPU only).
+        - adaptive_batching: Tune the summarization batch size and max_batch_tokens together
+          at run time, starting from initial_batch_size, within the memory budget, and split
+          batches that run out of memory. The batch_size arguments then only set the
+          checkpoint granularity. See AdaptiveBatchController.
+        """
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown summarization mode: {mode}. Expected one of {self.MODES}.")
+        if mode == 'topic' and encoder is None:
+            raise ValueError("Topic summarization needs an encoder.")
+
+        self.mode = mode
+        self.encoder = encoder
+        self.max_input_tokens = max_input_tokens
+        self.max_candidates = max_candidates
+        self.duplicate_threshold = duplicate_threshold
+        self.result_cache = result_cache
+        self.quantize = quantize
+        self.cache_config = f"{self.MODEL_NAME}|{max_input_tokens}|100,30,2.0,4,2.5,3"
+        if quantize:
+            self.cache_config += "|int8"
+
+        self.backend = get_backend()
+        self.device = self.backend.device
+        self.max_batch_tokens = max_batch_tokens
+        self.batch_controller = AdaptiveBatchController(
+            'summarize', initial_batch_size, maximum=8 * initial_batch_size
+        ) if adaptive_batching else None
         self.effectiveness_classifier = TopicEffectivenessClassifier()
+        self._batcher = None
 
-    def generate_conclusions(self, opinions, batch_size=64):
-        grouped_comments = defaultdict(list)
-        for opinion in opinions:
-            grouped_comments[opinion['topic']].append(opinion)
+    @property
+    def tokenizer(self):
+        return get_model(('tokenizer', self.MODEL_NAME), lambda: BartTokenizer.from_pretrained(self.MODEL_NAME))
 
-        results = []
-        summaries = []
+    @property
+    def summarization_model(self):
+        if self.quantize:
+            return get_model(
+                ('summarization', self.MODEL_NAME, 'int8'),
+                lambda: load_quantized(
+                    self.MODEL_NAME, lambda: BartForConditionalGeneration.from_pretrained(self.MODEL_NAME)
+                )
+            )
+        return get_model(
+            ('summarization', self.MODEL_NAME, self.device),
+            lambda: BartForConditionalGeneration.from_pretrained(self.MODEL_NAME).to(self.device)
+        )
 
-        all_comments = [
-            (topic, comment) for topic, comments in grouped_comments.items() for comment in comments
-        ]
-        total_comments = len(all_comments)
+    @property
+    def batcher(self):
+        if self._batcher is None:
+            self._batcher = LengthBucketBatcher(
+                self.tokenizer, max_tokens=self.max_batch_tokens, max_length=self.max_input_tokens,
+                controller=self.batch_controller
+            )
+        return self._batcher
+
+    def load(self):
+        """
+        Loads the summarization model instead of waiting for the first conclusions.
+        """
+        self.batcher
+        self.summarization_model
+
+    def generate_conclusions(self, opinions, batch_size=64, checkpoint=None, summarize_texts=None):
+        return self.generate_conclusions_batch([opinions], batch_size, checkpoint, summarize_texts)[0]
+
+    def generate_conclusions_batch(self, opinion_sets, batch_size=64, checkpoint=None, summarize_texts=None):
+        """
+        Generates conclusions for several independent ClassifiedComments sets in shared
+        summarization batches. Returns one list of (topic, effectiveness, summaries) per set.
+        With a CheckpointStore, summaries are recorded every CHECKPOINT_INTERVAL batches and
+        the ones recorded by an earlier run are reused. summarize_texts(texts, batch_size), if
+        given, produces the summaries instead of this generator's own model, e.g. in worker
+        processes.
+        """
+        with timed_stage('conclusions', sum(len(opinions) for opinions in opinion_sets)):
+            grouped_texts = {}
+            effectiveness = {}
+            for set_index, opinions in enumerate(opinion_sets):
+                # Comments below the similarity cutoff have no topic and are not part of any group.
+                labels = self.effectiveness_classifier.classify_type_count_matrix(
+                    opinions.type_count_matrix(), opinions.types
+                )
+                for code, topic, indices in opinions.topic_groups():
+                    grouped_texts[(set_index, topic)] = [opinions.texts[i] for i in indices]
+                    effectiveness[(set_index, topic)] = labels[code]
+
+            topic_summaries = self.summarize_groups(grouped_texts, batch_size, checkpoint, summarize_texts)
+
+            results = [[] for _ in opinion_sets]
+            for set_index, topic in grouped_texts:
+                key = (set_index, topic)
+                results[set_index].append((topic, effectiveness[key], topic_summaries[key]))
+
+            GPUResourceManager.clear_gpu_memory()
+            return results
+
+    def summarize_groups(self, grouped_texts, batch_size=64, checkpoint=None, summarize_texts=None):
+        """
+        Summarizes {key: [comment texts]} groups and returns {key: [summaries]}.
+        """
+        summarize_texts = summarize_texts or self.summarize_texts
+        if self.mode == 'topic':
+            return self._summarize_topics(grouped_texts, batch_size, checkpoint, summarize_texts)
+        return self._summarize_comments(grouped_texts, batch_size, checkpoint, summarize_texts)
+
+    def _summarize_comments(self, grouped_texts, batch_size, checkpoint, summarize_texts):
+        all_texts = [text for texts in grouped_texts.values() for text in texts]
+        summaries = self._summarize_checkpointed(all_texts, batch_size, checkpoint, summarize_texts)
+
+        topic_summaries = {}
+        start = 0
+        for topic, texts in grouped_texts.items():
+            topic_summaries[topic] = summaries[start:start + len(texts)]
+            start += len(texts)
+        return topic_summaries
+
+    def _summarize_topics(self, grouped_texts, batch_size, checkpoint, summarize_texts):
+        topics = list(grouped_texts)
+        documents = [' '.join(self.select_representatives(grouped_texts[topic])) for topic in topics]
 
-        for i in range(0, len(all_comments), batch_size):
-            batch = all_comments[i:i + batch_size]
-            batch_comments = [t[1]['text'] for t in batch]
+        summaries = self._summarize_checkpointed(documents, batch_size, checkpoint, summarize_texts)
+        return {topic: [summary] for topic, summary in zip(topics, summaries)}
 
-            progress = (i + len(batch)) / total_comments * 100
+    def _summarize_checkpointed(self, texts, batch_size, checkpoint, summarize_texts):
+        if checkpoint is None:
+            return summarize_texts(texts, batch_size)
+
+        return run_batches(
+            len(texts), batch_size * self.CHECKPOINT_INTERVAL,
+            lambda start, end: summarize_texts(texts[start:end], batch_size),
+            checkpoint, 'summarize'
+        )
+
+    def summarize_texts(self, texts, batch_size=64):
+        """
+        Returns one summary per text, in order.
+        """
+        if self.result_cache is None:
+            return self._summarize_uncached(texts, batch_size)
+
+        return self.result_cache.get_or_compute(
+            'summary', texts, self.cache_config,
+            lambda indices: self._summarize_uncached([texts[i] for i in indices], batch_size)
+        )
+
+    def _summarize_uncached(self, texts, batch_size):
+        summaries = [None] * len(texts)
+        done = 0
+
+        for indices in self.batcher.batches(texts, max_batch_size=batch_size):
+            batch_summaries = self.batcher.call([texts[i] for i in indices], self._summarize_batch)
+            for i, summary in zip(indices, batch_summaries):
+                summaries[i] = summary
+
+            done += len(indices)
+            progress = done / len(texts) * 100
             logging.info(f"Processing Conclusions batch {progress:.2f}%... ")
 
+        return summaries
+
+    def select_representatives(self, texts):
+        """
+        Ranks a topic's unique comments by centrality (similarity to the mean embedding),
+        skips near-duplicates of already selected ones, and keeps the most central comments
+        that fit in the summarizer's token budget.
+        """
+        candidates = list(dict.fromkeys(texts))
+        if len(candidates) > self.max_candidates:
+            step = len(candidates) / self.max_candidates
+            candidates = [candidates[int(i * step)] for i in range(self.max_candidates)]
+
+        embeddings = np.asarray(self.backend.asnumpy(self.encoder.encode_comments(candidates)))
+        centroid = embeddings.mean(axis=0)
+        centrality = embeddings @ (centroid / max(np.linalg.norm(centroid), 1e-12))
+        lengths = [
+            len(ids) for ids in self.tokenizer(candidates, add_special_tokens=False)['input_ids']
+        ]
+
+        budget = self.max_input_tokens - self.tokenizer.num_special_tokens_to_add()
+        selected = []
+        used = 0
+        for i in np.argsort(-centrality, kind='stable'):
+            if used + lengths[i] > budget:
+                if selected:
+                    continue
+                # The most central comment alone overflows, let truncation cut it.
+            elif selected and (embeddings[selected] @ embeddings[i]).max() > self.duplicate_threshold:
+                continue
+
+            selected.append(i)
+            used += lengths[i] + 1
+            if used >= budget:
+                break
+
+        return [candidates[i] for i in selected]
+
+    def _summarize_batch(self, texts):
+        with timed_stage('summarize', len(texts)):
             inputs = self.tokenizer(
-                batch_comments,
+                texts,
                 return_tensors="pt",
-                max_length=1024,
+                max_length=self.max_input_tokens,
                 padding=True,
                 truncation=True
-            ).to('cuda')
+            ).to(self.device)
 
             summary_ids = self.summarization_model.generate(
                 inputs["input_ids"],
+                attention_mask=inputs["attention_mask"],
                 max_length=100,
                 min_length=30,
                 length_penalty=2.0,
@@ -56,19 +258,7 @@ class ConclusionGenerator:
                 early_stopping=True
             )
 
-            batch_summaries = [
+            return [
                 self.tokenizer.decode(g, skip_special_tokens=True).replace('"', "`")
                 for g in summary_ids
             ]
-            summaries.extend(batch_summaries)
-
-        for topic, comments in grouped_comments.items():
-            effectiveness = self.effectiveness_classifier.classify_topic_effectiveness(comments)
-            topic_summaries = [
-                summaries[i] for i, (t, _) in enumerate(all_comments) if t == topic
-            ]
-
-            results.append((topic, effectiveness, topic_summaries))
-
-        GPUResourceManager.clear_gpu_memory()
-        return results
@@ -0,0 +1,371 @@
+# coordinator.py
+
+import argparse
+import logging
+import multiprocessing
+import threading
+import time
+from concurrent import futures
+
+import grpc
+
+import opinion_analyzer_pb2
+import opinion_analyzer_pb2_grpc
+from classified_comments import ClassifiedComments
+from grpc_client import MAX_MESSAGE_BYTES, MESSAGE_SIZE_OPTIONS, OpinionAnalyzerClient
+from grpc_server import MetricsInterceptor, to_opinion_messages, to_topic_messages, topic_set_id
+from metrics import MetricsServer
+from topic_effectiveness_classifier import TopicEffectivenessClassifier
+
+
+def _message_bytes(texts):
+    # Encoded size of the texts plus a few bytes of framing each.
+    return sum(len(text.encode('utf-8')) + 8 for text in texts)
+
+
+class Coordinator:
+    def __init__(self, workers, shard_size=512, max_attempts=3, timeout=600, retry_after=30,
+                 summarization_mode='comment', max_request_bytes=MAX_MESSAGE_BYTES // 4):
+        """
+        Splits analyses across worker servers that each run the regular OpinionAnalyzerService.
+
+        Opinions are classified in shards of shard_size on the workers, which receive the
+        topic list once through RegisterTopics. The classified opinions are merged in input
+        order, effectiveness is computed from the merged type counts and whole topic groups
+        are summarized on the workers, so the results match a single-node run.
+
+        Parameters:
+        - workers: Addresses ('host:port') of the worker servers.
+        - shard_size: Opinions per classification request.
+        - max_attempts: Workers tried per shard; a shard whose worker fails moves to the next one.
+        - timeout: Seconds before a worker call is abandoned and retried elsewhere.
+        - retry_after: Seconds a failed worker is passed over before it is tried again; it
+          is still tried when every other worker failed too.
+        - summarization_mode: The workers' ConclusionGenerator mode. In 'comment' mode large
+          topic groups are split across summarization requests.
+        - max_request_bytes: Approximate size above which summarization texts are split into
+          several requests.
+        """
+        if not workers:
+            raise ValueError("The coordinator needs at least one worker.")
+
+        self.targets = list(workers)
+        self.clients = [OpinionAnalyzerClient(target) for target in self.targets]
+        self.shard_size = shard_size
+        self.max_attempts = max_attempts
+        self.timeout = timeout
+        self.retry_after = retry_after
+        self.summarization_mode = summarization_mode
+        self.max_request_bytes = max_request_bytes
+        self._registered = [set() for _ in self.clients]
+        self._failed_at = {}
+        self._lock = threading.Lock()
+        self._executor = futures.ThreadPoolExecutor(max_workers=4 * len(self.clients))
+
+    def _candidates(self, first):
+        """
+        Returns up to max_attempts workers to try in turn, starting at worker first, with the
+        workers that failed within the last retry_after seconds moved to the end.
+        """
+        order = [(first + i) % len(self.clients) for i in range(len(self.clients))]
+        now = time.monotonic()
+        with self._lock:
+            failed = {
+                worker for worker, failed_at in self._failed_at.items() if now - failed_at < self.retry_after
+            }
+        return ([worker for worker in order if worker not in failed] +
+                [worker for worker in order if worker in failed])[:self.max_attempts]
+
+    def _with_failover(self, first, fn, description):
+        """
+        Calls fn(worker index) on the workers from _candidates(first) until one succeeds.
+        Workers whose call fails are marked failed, so later calls skip them for a while.
+        """
+        error = None
+        candidates = self._candidates(first)
+        for worker in candidates:
+            try:
+                result = fn(worker)
+            except grpc.RpcError as e:
+                if e.code() == grpc.StatusCode.INVALID_ARGUMENT:
+                    # Every worker would reject the request the same way.
+                    raise ValueError(e.details()) from e
+                error = e
+                with self._lock:
+                    self._failed_at[worker] = time.monotonic()
+                logging.warning(f"{description} failed on worker {self.targets[worker]}: {e.code()}; reassigning.")
+                continue
+
+            with self._lock:
+                self._failed_at.pop(worker, None)
+            return result
+        raise RuntimeError(f"{description} failed on {len(candidates)} worker(s).") from error
+
+    def _register(self, worker, topics, key):
+        with self._lock:
+            if key in self._registered[worker]:
+                return
+        self.clients[worker].register_topics(topics, timeout=self.timeout)
+        with self._lock:
+            self._registered[worker].add(key)
+
+    def _classify_on(self, worker, topics, key, opinions):
+        self._register(worker, topics, key)
+        try:
+            return self.clients[worker].classify(key, opinions, timeout=self.timeout)
+        except grpc.RpcError as e:
+            if e.code() != grpc.StatusCode.NOT_FOUND:
+                raise
+            # The worker restarted or evicted the topic set; register it again.
+            with self._lock:
+                self._registered[worker].discard(key)
+            self._register(worker, topics, key)
+            return self.clients[worker].classify(key, opinions, timeout=self.timeout)
+
+    def classify(self, topics, opinions):
+        """
+        Classifies opinions on the workers and returns one ClassifiedComments in input order.
+        """
+        key = topic_set_id(topics)
+        shards = [opinions[i:i + self.shard_size] for i in range(0, len(opinions), self.shard_size)]
+        logging.info(f"Classifying {len(opinions)} opinions in {len(shards)} shards on {len(self.clients)} workers...")
+
+        pending = [
+            self._executor.submit(
+                self._with_failover, index,
+                lambda worker, shard=shard: self._classify_on(worker, topics, key, shard),
+                f"Shard {index}"
+            )
+            for index, shard in enumerate(shards)
+        ]
+        rows = []
+        for future in pending:
+            rows.extend((text, topic or None, type_ or None) for text, topic, type_ in future.result())
+        return ClassifiedComments.from_rows(rows)
+
+    def _split(self, texts):
+        """
+        Splits texts into consecutive parts of at most max_request_bytes (at least one text each).
+        """
+        parts = [[]]
+        size = 0
+        for text in texts:
+            text_size = _message_bytes([text])
+            if parts[-1] and size + text_size > self.max_request_bytes:
+                parts.append([])
+                size = 0
+            parts[-1].append(text)
+            size += text_size
+        return parts
+
+    def summarize_groups(self, grouped_texts):
+        """
+        Summarizes {topic: [texts]} on the workers, balancing the number of texts per worker,
+        and returns {topic: [summaries]}. Requests are kept below max_request_bytes: in
+        'comment' mode every text is summarized on its own, so a large topic is split into
+        parts sent separately, while in 'topic' mode a topic's texts always go in one request.
+        """
+        parts = []
+        for topic, texts in grouped_texts.items():
+            if self.summarization_mode == 'comment':
+                parts.extend((topic, part) for part in self._split(texts))
+            else:
+                parts.append((topic, texts))
+
+        # Each request maps its topics to part indices; a request holds one part per topic.
+        loads = [0] * len(self.clients)
+        requests = [[] for _ in self.clients]
+        for index in sorted(range(len(parts)), key=lambda i: -len(parts[i][1])):
+            topic, texts = parts[index]
+            worker = loads.index(min(loads))
+            loads[worker] += len(texts)
+            size = _message_bytes(texts)
+            worker_requests = requests[worker]
+            if (not worker_requests or topic in worker_requests[-1][0]
+                    or worker_requests[-1][1] + size > self.max_request_bytes):
+                worker_requests.append(({}, 0))
+            request, request_size = worker_requests[-1]
+            request[topic] = index
+            worker_requests[-1] = (request, request_size + size)
+
+        pending = []
+        for worker, worker_requests in enumerate(requests):
+            for request, _ in worker_requests:
+                groups = {topic: parts[index][1] for topic, index in request.items()}
+                pending.append((request, self._executor.submit(
+                    self._with_failover, worker,
+                    lambda worker, groups=groups: self.clients[worker].summarize_topics(groups, timeout=self.timeout),
+                    f"Summaries of {len(groups)} topic(s)"
+                )))
+        part_summaries = [None] * len(parts)
+        for request, future in pending:
+            summaries = future.result()
+            for topic, index in request.items():
+                part_summaries[index] = summaries[topic]
+
+        # A topic's parts are consecutive and in order.
+        summaries = {}
+        for (topic, _), part in zip(parts, part_summaries):
+            summaries.setdefault(topic, []).extend(part)
+        return summaries
+
+    def analyze(self, topics, opinions):
+        """
+        Distributed analyze_grpc: returns (opinions_result, topics_result) like a single node.
+        """
+        comments = self.classify(topics, opinions)
+
+        labels = TopicEffectivenessClassifier.classify_type_count_matrix(comments.type_count_matrix(), comments.types)
+        groups = list(comments.topic_groups())
+        summaries = self.summarize_groups({topic: [comments.texts[i] for i in indices] for _, topic, indices in groups})
+
+        topics_result = [
+            (topic, summary, labels[code])
+            for code, topic, _ in groups
+            for summary in summaries[topic]
+        ]
+        return list(comments.rows()), topics_result
+
+    def workers_ready(self):
+        ready = []
+        for client in self.clients:
+            try:
+                ready.append(client.check_ready()[0])
+            except grpc.RpcError:
+                ready.append(False)
+        return ready
+
+    def close(self):
+        self._executor.shutdown()
+        for client in self.clients:
+            client.close()
+
+
+class CoordinatorServicer(opinion_analyzer_pb2_grpc.OpinionAnalyzerServiceServicer):
+    def __init__(self, coordinator: Coordinator):
+        self.coordinator = coordinator
+
+    def AnalyzeOpinion(self, request, context):
+        topics = list(request.topics)
+        opinions = list(request.opinions)
+        logging.info(f"Received gRPC request with {len(topics)} topics and {len(opinions)} opinions.")
+
+        try:
+            opinions_result, topics_result = self.coordinator.analyze(topics, opinions)
+        except ValueError as e:
+            context.abort(grpc.StatusCode.INVALID_ARGUMENT, str(e))
+        except RuntimeError as e:
+            context.abort(grpc.StatusCode.UNAVAILABLE, str(e))
+
+        return opinion_analyzer_pb2.AnalyzeResponse(
+            opinions=to_opinion_messages(opinions_result),
+            topics=to_topic_messages(topics_result)
+        )
+
+    def CheckReady(self, request, context):
+        # Reports ready once every worker is.
+        ready = self.coordinator.workers_ready()
+        return opinion_analyzer_pb2.ReadyResponse(
+            ready=all(ready),
+            loaded_models=[f'worker {target}' for target, up in zip(self.coordinator.targets, ready) if up]
+        )
+
+
+class CoordinatorServer:
+    def __init__(self, workers, host: str = '[::]:50051', shard_size: int = 512, max_attempts: int = 3,
+                 timeout: float = 600, metrics_port: int = None, summarization_mode: str = 'comment'):
+        """
+        gRPC server that answers AnalyzeOpinion by spreading the work over worker servers.
+
+        Parameters:
+        - workers: Addresses of the worker servers.
+        - host: The address and port on which the coordinator listens.
+        - shard_size, max_attempts, timeout, summarization_mode: See Coordinator.
+        - metrics_port: When set, RPC metrics are served at http://127.0.0.1:<metrics_port>/metrics.
+        """
+        self.host = host
+        self.coordinator = Coordinator(
+            workers, shard_size, max_attempts, timeout, summarization_mode=summarization_mode
+        )
+        self.server = grpc.server(
+            futures.ThreadPoolExecutor(max_workers=10),
+            interceptors=[MetricsInterceptor()],
+            options=MESSAGE_SIZE_OPTIONS
+        )
+        self.metrics_server = MetricsServer(metrics_port) if metrics_port else None
+        opinion_analyzer_pb2_grpc.add_OpinionAnalyzerServiceServicer_to_server(
+            CoordinatorServicer(self.coordinator), self.server)
+
+    def start(self):
+        """
+        Starts the coordinator and keeps it running.
+        """
+        if self.metrics_server is not None:
+            self.metrics_server.start()
+        self.server.add_insecure_port(self.host)
+        self.server.start()
+        logging.info(f"Coordinator started on {self.host} with workers {self.coordinator.targets}")
+
+        try:
+            while True:
+                time.sleep(86400)
+        except KeyboardInterrupt:
+            self.server.stop(0)
+            self.coordinator.close()
+            if self.metrics_server is not None:
+                self.metrics_server.stop()
+            logging.info("Coordinator stopped.")
+
+
+def _run_worker(host):
+    logging.basicConfig(level=logging.INFO, format=f'%(asctime)s - {host} - %(levelname)s - %(message)s')
+
+    from compute_backend import configure_backend
+    from grpc_server import GRPCServer
+
+    configure_backend()
+    GRPCServer(host=host, warm_up=True).start()
+
+
+def start_local_workers(count, base_port=50052):
+    """
+    Starts count worker servers in separate processes on localhost ports base_port,
+    base_port + 1, ... and returns (processes, addresses). Meant for trying the coordinator
+    on one machine.
+    """
+    context = multiprocessing.get_context('spawn')
+    processes = []
+    addresses = []
+    for port in range(base_port, base_port + count):
+        process = context.Process(target=_run_worker, args=(f'[::]:{port}',), daemon=True)
+        process.start()
+        processes.append(process)
+        addresses.append(f'localhost:{port}')
+    return processes, addresses
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description="Run a coordinator that shards analyses across worker servers.")
+    parser.add_argument('--host', default='[::]:50051')
+    parser.add_argument('--workers', default='', help="Comma-separated worker addresses, e.g. node1:50051,node2:50051.")
+    parser.add_argument('--local-workers', type=int, default=0, help="Also start this many workers on localhost.")
+    parser.add_argument('--base-port', type=int, default=50052, help="First port of the local workers.")
+    parser.add_argument('--shard-size', type=int, default=512)
+    parser.add_argument('--max-attempts', type=int, default=3)
+    parser.add_argument('--timeout', type=float, default=600)
+    parser.add_argument('--metrics-port', type=int, default=None)
+    parser.add_argument('--summarization-mode', choices=['comment', 'topic'], default='comment',
+                        help="Summarization mode of the workers.")
+    args = parser.parse_args()
+
+    workers = [address.strip() for address in args.workers.split(',') if address.strip()]
+    if args.local_workers:
+        _, local_addresses = start_local_workers(args.local_workers, args.base_port)
+        workers.extend(local_addresses)
+
+    CoordinatorServer(
+        workers, args.host, args.shard_size, args.max_attempts, args.timeout, args.metrics_port,
+        args.summarization_mode
+    ).start()
@@ -0,0 +1,158 @@
+# first_stage_classifier.py
+
+from transformers import pipeline
+
+from compute_backend import get_backend
+from model_registry import get_model
+from text_preprocessor import TextPreprocessor
+
+
+class CentroidCommentClassifier:
+    PROTOTYPES = {
+        "Claim": [
+            "I believe this is true.",
+            "In my opinion this is the right position.",
+            "This is clearly a good idea and we should support it.",
+        ],
+        "Counterclaim": [
+            "Some people argue the opposite.",
+            "Others may say that this is not the case.",
+            "On the other hand, critics believe it is a bad idea.",
+        ],
+        "Rebuttal": [
+            "However, that argument is wrong.",
+            "That objection does not hold up because it ignores the facts.",
+            "Even so, the opposing view fails to convince.",
+        ],
+        "Evidence": [
+            "For example, studies show that the numbers increased.",
+            "According to the article, research found clear results.",
+            "Statistics and data from the report support this.",
+        ],
+    }
+
+    def __init__(self, encoder, labels, temperature=0.05, prototypes=None, preprocessor=None, prior_weight=8):
+        """
+        Labels comments by cosine similarity to per-label centroids in the sentence embedding
+        space used for topic matching, so it costs no extra model pass.
+
+        The centroids start from the prototypes and move towards the comments labeled by the
+        escalation model as they arrive (see update), so the confidence follows agreement
+        with that model rather than with the hand-written prototypes.
+
+        Parameters:
+        - encoder: Object with an encode_comments(texts) method returning normalized embeddings.
+        - labels: Candidate labels, in the order used by the caller.
+        - temperature: Softmax temperature applied to the similarities to get a confidence.
+        - prototypes: Optional {label: [example texts]} replacing the built-in prototypes.
+        - preprocessor: TextPreprocessor applied to the prototypes, the same one the comments
+          went through; None creates one.
+        - prior_weight: Number of labeled comments the prototype centroid of a label counts as.
+        """
+        self.encoder = encoder
+        self.labels = labels
+        self.temperature = temperature
+        self.backend = get_backend()
+        self.prototypes = prototypes or self.PROTOTYPES
+        self.preprocessor = preprocessor or TextPreprocessor()
+        self.prior_weight = prior_weight
+        self._centroids = None
+        self._sums = None
+
+    @property
+    def centroids(self):
+        # Built on first use, since encoding the prototypes loads the embedding model.
+        if self._centroids is None:
+            self._centroids = self._build_centroids(self.prototypes)
+        return self._centroids
+
+    def load(self):
+        self.centroids
+
+    def _build_centroids(self, prototypes):
+        xp = self.backend.xp
+        centroids = []
+        for label in self.labels:
+            # Comments are embedded after preprocessing, so the prototypes must be too.
+            texts = [text for text in self.preprocessor.preprocess_batch(prototypes[label], processes=1) if text]
+            centroid = self.encoder.encode_comments(texts or prototypes[label]).mean(axis=0)
+            centroids.append(centroid / xp.maximum(xp.linalg.norm(centroid), 1e-12))
+        return xp.stack(centroids)
+
+    def update(self, comments, labels, embeddings=None):
+        """
+        Adds comments labeled by the escalation model to the running per-label means. Each
+        centroid becomes the normalized mean of its labeled comments so far, with the starting
+        centroid counted as prior_weight comments.
+        """
+        xp = self.backend.xp
+        known = [i for i, label in enumerate(labels) if label in self.labels]
+        if not known:
+            return
+        if embeddings is None:
+            embeddings = self.encoder.encode_comments([comments[i] for i in known])
+        else:
+            embeddings = embeddings[known]
+
+        if self._sums is None:
+            self._sums = self.centroids * self.prior_weight
+        label_ids = xp.asarray([self.labels.index(labels[i]) for i in known])
+        sums = self._sums.copy()
+        for i in range(len(self.labels)):
+            members = embeddings[label_ids == i]
+            if members.shape[0]:
+                sums[i] += members.sum(axis=0)
+        self._sums = sums
+        # Replaced rather than updated in place, so a concurrent predict sees either version.
+        self._centroids = sums / xp.maximum(xp.linalg.norm(sums, axis=1, keepdims=True), 1e-12)
+
+    def predict(self, comments, embeddings=None):
+        """
+        Returns (labels, confidences) where confidence is the softmax probability of the label.
+        """
+        xp = self.backend.xp
+        if embeddings is None:
+            embeddings = self.encoder.encode_comments(comments)
+
+        logits = xp.matmul(embeddings, self.centroids.T) / self.temperature
+        logits -= logits.max(axis=1, keepdims=True)
+        probabilities = xp.exp(logits)
+        probabilities /= probabilities.sum(axis=1, keepdims=True)
+
+        best = self.backend.asnumpy(probabilities.argmax(axis=1))
+        confidences = self.backend.asnumpy(probabilities.max(axis=1))
+        return [self.labels[i] for i in best], [float(c) for c in confidences]
+
+
+class DistilledNLIClassifier:
+    def __init__(self, labels, model="typeform/distilbert-base-uncased-mnli", batch_size=256):
+        """
+        Zero-shot classification with a small distilled NLI model.
+
+        Parameters:
+        - labels: Candidate labels.
+        - model: Hugging Face model name of the distilled NLI model.
+        - batch_size: Pipeline batch size.
+        """
+        self.device = get_backend().device
+        self.labels = labels
+        self.model = model
+        self.batch_size = batch_size
+
+    @property
+    def classifier(self):
+        return get_model(
+            ('zero-shot-classification', self.model, self.device),
+            lambda: pipeline("zero-shot-classification", model=self.model, device=self.device)
+        )
+
+    def load(self):
+        self.classifier
+
+    def update(self, comments, labels, embeddings=None):
+        # The distilled model is not refit from the escalation model's labels.
+        pass
+
+    def predict(self, comments, embeddings=None):
+        results = self.classifier(comments, candidate_labels=self.labels, batch_size=self.batch_size)
+        return [r['labels'][0] for r in results], [float(r['scores'][0]) for r in results]
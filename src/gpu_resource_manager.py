@@ -3,15 +3,18 @@
 import gc
 import logging
 
-import cupy as cp
+from compute_backend import get_backend
 
 
 class GPUResourceManager:
     @staticmethod
     def clear_gpu_memory():
+        backend = get_backend()
+        if not backend.is_gpu:
+            return
+
         try:
-            cp.get_default_memory_pool().free_all_blocks()
-            cp.get_default_pinned_memory_pool().free_all_blocks()
+            backend.free_memory()
             gc.collect()
             logging.info("GPU memory successfully cleared.")
         except Exception as e:
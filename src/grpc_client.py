@@ -0,0 +1,124 @@
+# grpc_client.py
+
+import itertools
+
+import grpc
+
+import opinion_analyzer_pb2
+import opinion_analyzer_pb2_grpc
+
+# gRPC rejects messages above 4 MB by default; whole topic groups and large requests exceed that.
+MAX_MESSAGE_BYTES = 64 << 20
+MESSAGE_SIZE_OPTIONS = [
+    ('grpc.max_send_message_length', MAX_MESSAGE_BYTES),
+    ('grpc.max_receive_message_length', MAX_MESSAGE_BYTES),
+]
+
+
+class OpinionAnalyzerClient:
+    def __init__(self, target: str = 'localhost:50051'):
+        """
+        Thin client for the OpinionAnalyzerService.
+
+        Parameters:
+        - target: Address and port of the gRPC server.
+        """
+        self.channel = grpc.insecure_channel(target, options=MESSAGE_SIZE_OPTIONS)
+        self.stub = opinion_analyzer_pb2_grpc.OpinionAnalyzerServiceStub(self.channel)
+
+    def analyze(self, topics, opinions):
+        response = self.stub.AnalyzeOpinion(
+            opinion_analyzer_pb2.AnalyzeRequest(topics=topics, opinions=opinions)
+        )
+        return self._opinions_result(response), self._topics_result(response)
+
+    def analyze_stream(self, topics, opinions, chunk_size=256):
+        """
+        Streams opinions (any iterable, read lazily) to the server in chunks of chunk_size.
+        Yields ('opinions', [(text, topic, type)]) as batches complete, then
+        ('topics', [(topic, summary, effectiveness)]).
+        """
+        responses = self.stub.AnalyzeOpinionStream(self._chunks(topics, opinions, chunk_size))
+        for response in responses:
+            if response.opinions:
+                yield 'opinions', self._opinions_result(response)
+            if response.topics:
+                yield 'topics', self._topics_result(response)
+
+    def check_ready(self):
+        """
+        Returns (ready, loaded_models) as reported by the server.
+        """
+        response = self.stub.CheckReady(opinion_analyzer_pb2.ReadyRequest())
+        return response.ready, list(response.loaded_models)
+
+    def register_topics(self, topics, timeout=None):
+        """
+        Stores topics on the server and returns the id that classify refers to them by.
+        """
+        response = self.stub.RegisterTopics(opinion_analyzer_pb2.RegisterTopicsRequest(topics=topics), timeout=timeout)
+        return response.topic_set_id
+
+    def classify(self, topic_set_id, opinions, timeout=None):
+        """
+        Classifies opinions against registered topics without generating conclusions and
+        returns [(text, topic, type)].
+        """
+        response = self.stub.AnalyzeOpinion(
+            opinion_analyzer_pb2.AnalyzeRequest(opinions=opinions, topic_set_id=topic_set_id, skip_conclusions=True),
+            timeout=timeout
+        )
+        return self._opinions_result(response)
+
+    def summarize_topics(self, grouped_texts, timeout=None):
+        """
+        Summarizes {topic: [preprocessed texts]} on the server and returns {topic: [summaries]}.
+        """
+        response = self.stub.SummarizeTopics(
+            opinion_analyzer_pb2.SummarizeTopicsRequest(groups=[
+                opinion_analyzer_pb2.TopicTexts(topic_name=topic, texts=texts) for topic, texts in grouped_texts.items()
+            ]),
+            timeout=timeout
+        )
+        return {group.topic_name: list(group.texts) for group in response.groups}
+
+    def topic_effectiveness(self, topics, window_seconds=0):
+        """
+        Returns [(topic, effectiveness, {type: count})] from the server's topic aggregates,
+        counting only the last window_seconds if it is non-zero.
+        """
+        response = self.stub.GetTopicEffectiveness(
+            opinion_analyzer_pb2.TopicEffectivenessRequest(topics=topics, window_seconds=window_seconds)
+        )
+        return [
+            (topic.topic_name, topic.effectiveness, {
+                'Claim': topic.claim,
+                'Counterclaim': topic.counterclaim,
+                'Rebuttal': topic.rebuttal,
+                'Evidence': topic.evidence,
+            })
+            for topic in response.topics
+        ]
+
+    @staticmethod
+    def _chunks(topics, opinions, chunk_size):
+        # gRPC pulls from this generator only as flow control allows, so the upload is never
+        # buffered in full on the client side.
+        yield opinion_analyzer_pb2.AnalyzeRequest(topics=topics)
+        opinions = iter(opinions)
+        while True:
+            chunk = list(itertools.islice(opinions, chunk_size))
+            if not chunk:
+                break
+            yield opinion_analyzer_pb2.AnalyzeRequest(opinions=chunk)
+
+    @staticmethod
+    def _opinions_result(response):
+        return [(opinion.text, opinion.topic, opinion.type) for opinion in response.opinions]
+
+    @staticmethod
+    def _topics_result(response):
+        return [(topic.topic_name, topic.summary, topic.effectiveness) for topic in response.topics]
+
+    def close(self):
+        self.channel.close()
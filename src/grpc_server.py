@@ -1,61 +1,268 @@
 import grpc
+from collections import OrderedDict
 from concurrent import futures
+import hashlib
+import threading
 import time
 import logging
 
 import opinion_analyzer_pb2
 import opinion_analyzer_pb2_grpc
+from grpc_client import MESSAGE_SIZE_OPTIONS
+from metrics import MetricsServer, record_rpc
+from model_registry import loaded_models
 from opinion_analyzer import OpinionAnalyzer
+from request_scheduler import MicroBatchScheduler
+from streaming_session import StreamingSession
+from topic_aggregate_store import TopicAggregateStore
+
+
+def topic_set_id(topics):
+    digest = hashlib.sha256()
+    for topic in topics:
+        encoded = topic.encode('utf-8')
+        digest.update(len(encoded).to_bytes(8, 'little'))
+        digest.update(encoded)
+    return digest.hexdigest()
+
+
+def to_opinion_messages(opinions_result):
+    return [
+        opinion_analyzer_pb2.Opinion(text=text, topic=topic or '', type=op_type)
+        for text, topic, op_type in opinions_result
+    ]
+
+
+def to_topic_messages(topics_result):
+    return [
+        opinion_analyzer_pb2.Topic(topic_name=topic, summary=summary, effectiveness=effectiveness)
+        for topic, summary, effectiveness in topics_result
+    ]
+
+
+def _timed_unary(method, behavior):
+    def wrapper(request_or_iterator, context):
+        start = time.perf_counter()
+        status = 'ERROR'
+        try:
+            response = behavior(request_or_iterator, context)
+            status = 'OK'
+            return response
+        finally:
+            record_rpc(method, status, time.perf_counter() - start)
+    return wrapper
+
+
+def _timed_stream(method, behavior):
+    def wrapper(request_or_iterator, context):
+        start = time.perf_counter()
+        status = 'ERROR'
+        try:
+            yield from behavior(request_or_iterator, context)
+            status = 'OK'
+        finally:
+            record_rpc(method, status, time.perf_counter() - start)
+    return wrapper
+
+
+class MetricsInterceptor(grpc.ServerInterceptor):
+    """
+    Records the latency and outcome of every RPC in the metrics module. Streaming RPCs are
+    timed until their last response is sent.
+    """
+    def intercept_service(self, continuation, handler_call_details):
+        handler = continuation(handler_call_details)
+        if handler is None:
+            return None
+
+        method = handler_call_details.method.rsplit('/', 1)[-1]
+        if handler.unary_unary:
+            return handler._replace(unary_unary=_timed_unary(method, handler.unary_unary))
+        if handler.stream_unary:
+            return handler._replace(stream_unary=_timed_unary(method, handler.stream_unary))
+        if handler.unary_stream:
+            return handler._replace(unary_stream=_timed_stream(method, handler.unary_stream))
+        return handler._replace(stream_stream=_timed_stream(method, handler.stream_stream))
+
 
 class OpinionAnalyzerServicer(opinion_analyzer_pb2_grpc.OpinionAnalyzerServiceServicer):
-    def __init__(self, analyzer: OpinionAnalyzer):
-        self.analyzer = analyzer
+    MAX_TOPIC_SETS = 256
+
+    def __init__(self, scheduler: MicroBatchScheduler, stream_batch_size: int = 256, stream_max_in_flight: int = 2,
+                 ready: threading.Event = None, aggregate_store: TopicAggregateStore = None):
+        self.scheduler = scheduler
+        self.ready = ready
+        self.aggregate_store = aggregate_store
+        self.stream_batch_size = stream_batch_size
+        self.stream_max_in_flight = stream_max_in_flight
+        self.topic_sets = OrderedDict()
+        self._topic_sets_lock = threading.Lock()
 
     def AnalyzeOpinion(self, request, context):
         topics = list(request.topics)
         opinions = list(request.opinions)
+        if request.topic_set_id:
+            with self._topic_sets_lock:
+                topics = self.topic_sets.get(request.topic_set_id)
+            if topics is None:
+                context.abort(grpc.StatusCode.NOT_FOUND, f"Unknown topic set {request.topic_set_id}.")
         logging.info(f"Received gRPC request: Topics='{topics}', Opinions='{opinions}'")
 
-        opinions_result, topics_result = self.analyzer.analyze_grpc(topics, opinions)
+        try:
+            opinions_result, topics_result = self.scheduler.submit(
+                topics, opinions, with_conclusions=not request.skip_conclusions
+            ).result()
+        except ValueError as e:
+            context.abort(grpc.StatusCode.INVALID_ARGUMENT, str(e))
 
-        opinion_messages = [
-            opinion_analyzer_pb2.Opinion(text=text, topic=topic, type=op_type)
-            for text, topic, op_type in opinions_result
-        ]
+        response = opinion_analyzer_pb2.AnalyzeResponse(
+            opinions=to_opinion_messages(opinions_result),
+            topics=to_topic_messages(topics_result)
+        )
 
-        topic_messages = [
-            opinion_analyzer_pb2.Topic(topic_name=topic, summary=summary, effectiveness=effectiveness)
-            for topic, summary, effectiveness in topics_result
-        ]
+        return response
 
-        response = opinion_analyzer_pb2.AnalyzeResponse(opinions=opinion_messages, topics=topic_messages)
+    def AnalyzeOpinionStream(self, request_iterator, context):
+        logging.info("Received gRPC stream.")
 
-        return response
+        session = StreamingSession(self.scheduler, self.stream_batch_size, self.stream_max_in_flight)
+        chunks = ((list(request.topics), list(request.opinions)) for request in request_iterator)
+
+        try:
+            for kind, results in session.run(chunks):
+                if kind == 'opinions':
+                    yield opinion_analyzer_pb2.AnalyzeResponse(opinions=to_opinion_messages(results))
+                else:
+                    yield opinion_analyzer_pb2.AnalyzeResponse(topics=to_topic_messages(results))
+        except ValueError as e:
+            context.abort(grpc.StatusCode.INVALID_ARGUMENT, str(e))
+
+        logging.info("gRPC stream completed.")
+
+    def CheckReady(self, request, context):
+        return opinion_analyzer_pb2.ReadyResponse(
+            ready=self.ready is None or self.ready.is_set(),
+            loaded_models=[' '.join(str(part) for part in key) for key in loaded_models()]
+        )
+
+    def RegisterTopics(self, request, context):
+        topics = list(request.topics)
+        key = topic_set_id(topics)
+        # Only the most recently registered topic sets are kept.
+        with self._topic_sets_lock:
+            self.topic_sets[key] = topics
+            self.topic_sets.move_to_end(key)
+            while len(self.topic_sets) > self.MAX_TOPIC_SETS:
+                self.topic_sets.popitem(last=False)
+        return opinion_analyzer_pb2.RegisterTopicsResponse(topic_set_id=key)
+
+    def SummarizeTopics(self, request, context):
+        grouped_texts = {group.topic_name: list(group.texts) for group in request.groups}
+        logging.info(f"Received gRPC summarization request for {len(grouped_texts)} topic(s).")
+
+        summaries = self.scheduler.call(
+            lambda analyzer: analyzer.conclusion_generator.summarize_groups(grouped_texts)
+        )
+        return opinion_analyzer_pb2.SummarizeTopicsResponse(groups=[
+            opinion_analyzer_pb2.TopicTexts(topic_name=topic, texts=summaries[topic]) for topic in grouped_texts
+        ])
+
+    def GetTopicEffectiveness(self, request, context):
+        if self.aggregate_store is None:
+            context.abort(grpc.StatusCode.FAILED_PRECONDITION, "The server keeps no topic aggregates.")
+
+        # Stored topics are preprocessed like every analyzed topic; answer under the requested names.
+        topics = list(request.topics)
+        preprocessor = self.scheduler.analyzer.preprocessor
+        keys = [preprocessor.preprocess_text(topic) or topic for topic in topics]
+        aggregates = self.aggregate_store.query(keys, request.window_seconds or None)
+
+        messages = []
+        for topic, key in zip(topics, keys):
+            effectiveness, counts = aggregates[key]
+            messages.append(opinion_analyzer_pb2.TopicAggregate(
+                topic_name=topic,
+                effectiveness=effectiveness,
+                claim=counts['Claim'],
+                counterclaim=counts['Counterclaim'],
+                rebuttal=counts['Rebuttal'],
+                evidence=counts['Evidence']
+            ))
+        return opinion_analyzer_pb2.TopicEffectivenessResponse(topics=messages)
 
 class GRPCServer:
-    def __init__(self, host: str = '[::]:50051'):
+    def __init__(self, host: str = '[::]:50051', max_batch_size: int = 1024, max_wait_ms: int = 20,
+                 analyzer: OpinionAnalyzer = None, warm_up: bool = False, metrics_port: int = None,
+                 aggregate_store: TopicAggregateStore = None, analyzer_options: dict = None,
+                 max_workers: int = 32):
         """
         Initializes the gRPC server.
 
         Parameters:
         - host: The address and port on which the server listens.
+        - max_batch_size: Opinions merged from concurrent requests into one model batch.
+        - max_wait_ms: Longest time a request waits for others to share its batch.
+        - analyzer: OpinionAnalyzer to serve; one is created if omitted. Models are shared
+          process-wide either way and load on first use.
+        - warm_up: Load the models and run a tiny analysis right after the server starts.
+          CheckReady reports ready once it has finished.
+        - metrics_port: When set, stage and RPC metrics are served for Prometheus at
+          http://127.0.0.1:<metrics_port>/metrics.
+        - aggregate_store: TopicAggregateStore updated with every analyzed batch and served by
+          GetTopicEffectiveness. Defaults to the analyzer's store, if any.
+        - analyzer_options: OpinionAnalyzer arguments (search_mode, min_similarity...) used
+          when analyzer is omitted.
+        - max_workers: Threads serving RPCs. Every unary call and every open stream holds one
+          while it waits for the scheduler, so this bounds how many requests can be merged
+          into one batch. Requests usually carry many opinions, so a few dozen threads keep
+          batches full; raise it for many concurrent small requests.
         """
-        self.server = grpc.server(futures.ThreadPoolExecutor(max_workers=10))
+        self.server = grpc.server(
+            futures.ThreadPoolExecutor(max_workers=max_workers),
+            interceptors=[MetricsInterceptor()],
+            options=MESSAGE_SIZE_OPTIONS
+        )
         self.host = host
-        self.analyzer = OpinionAnalyzer()
+        self.analyzer = analyzer or OpinionAnalyzer(**(analyzer_options or {}))
+        if aggregate_store is not None:
+            self.analyzer.aggregate_store = aggregate_store
+        self.scheduler = MicroBatchScheduler(self.analyzer, max_batch_size, max_wait_ms)
+        self.warm_up = warm_up
+        self.ready = threading.Event()
+        self.metrics_server = MetricsServer(metrics_port) if metrics_port else None
         opinion_analyzer_pb2_grpc.add_OpinionAnalyzerServiceServicer_to_server(
-            OpinionAnalyzerServicer(self.analyzer), self.server)
+            OpinionAnalyzerServicer(self.scheduler, ready=self.ready, aggregate_store=self.analyzer.aggregate_store),
+            self.server)
 
     def start(self):
         """
         Starts the gRPC server and keeps it running.
         """
+        self.scheduler.start()
+        if self.metrics_server is not None:
+            self.metrics_server.start()
         self.server.add_insecure_port(self.host)
         self.server.start()
         logging.info(f"gRPC server started on {self.host}")
+
+        if self.warm_up:
+            # Runs on the scheduler thread, so requests arriving meanwhile wait behind it.
+            self.scheduler.submit_call(lambda analyzer: analyzer.warm_up()).add_done_callback(self._on_warm_up)
+        else:
+            self.ready.set()
+
         try:
             while True:
                 time.sleep(86400)  # Sleep for a day to keep the server running
         except KeyboardInterrupt:
             self.server.stop(0)
-            logging.info("gRPC server stopped.")
\ No newline at end of file
+            self.scheduler.stop()
+            if self.metrics_server is not None:
+                self.metrics_server.stop()
+            logging.info("gRPC server stopped.")
+
+    def _on_warm_up(self, future):
+        if future.exception() is not None:
+            logging.error(f"Warm-up failed: {future.exception()}")
+        self.ready.set()
+        logging.info("gRPC server ready.")
\ No newline at end of file
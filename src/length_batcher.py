@@ -0,0 +1,85 @@
+# length_batcher.py
+
+
+class LengthBucketBatcher:
+    def __init__(self, tokenizer, max_tokens, max_batch_size=None, max_length=None, items_per_text=1,
+                 controller=None):
+        """
+        Groups texts of similar tokenized length so batches carry little padding.
+
+        Parameters:
+        - tokenizer: Hugging Face tokenizer of the model the batches are fed to.
+        - max_tokens: Budget of padded tokens per batch (batch rows x longest row).
+        - max_batch_size: Optional cap on the number of texts per batch.
+        - max_length: Truncation length of the model; longer texts count as this many tokens.
+        - items_per_text: Model rows produced per text, e.g. one per candidate label
+          for zero-shot classification.
+        - controller: Optional AdaptiveBatchController. It then sets the cap on texts per batch
+          and scales the token budget with it, and batches that run out of memory are split.
+        """
+        self.tokenizer = tokenizer
+        self.max_tokens = max_tokens
+        self.max_batch_size = max_batch_size
+        self.max_length = max_length
+        self.items_per_text = items_per_text
+        self.controller = controller
+
+    def token_lengths(self, texts):
+        encoded = self.tokenizer(
+            list(texts),
+            truncation=self.max_length is not None,
+            max_length=self.max_length
+        )
+        return [len(ids) for ids in encoded['input_ids']]
+
+    def batches(self, texts, max_batch_size=None):
+        """
+        Yields lists of indices into texts, longest texts first. Each batch stays within the
+        token budget; a single text longer than the budget gets a batch of its own.
+        """
+        lengths = self.token_lengths(texts)
+        order = sorted(range(len(lengths)), key=lambda i: lengths[i], reverse=True)
+
+        batch = []
+        padded_length = 0
+        for i in order:
+            if batch:
+                # Read per batch, since the controller may change the size between batches.
+                limit, max_tokens = self._limits(max_batch_size)
+                rows = (len(batch) + 1) * self.items_per_text
+                full = limit is not None and len(batch) >= limit
+                if full or rows * padded_length > max_tokens:
+                    yield batch
+                    batch = []
+
+            if not batch:
+                padded_length = max(lengths[i], 1)
+            batch.append(i)
+
+        if batch:
+            yield batch
+
+    def run(self, texts, fn, max_batch_size=None):
+        """
+        Calls fn on each length-bucketed batch of texts and returns its outputs in the
+        original order of texts.
+        """
+        results = [None] * len(texts)
+        for indices in self.batches(texts, max_batch_size):
+            outputs = self.call([texts[i] for i in indices], fn)
+            for i, output in zip(indices, outputs):
+                results[i] = output
+        return results
+
+    def call(self, texts, fn):
+        """
+        Returns fn(texts), through the controller if there is one.
+        """
+        if self.controller is None:
+            return fn(texts)
+        return self.controller.call(texts, fn)
+
+    def _limits(self, max_batch_size):
+        if self.controller is None:
+            return max_batch_size or self.max_batch_size, self.max_tokens
+        return self.controller.batch_size, self.max_tokens * self.controller.scale
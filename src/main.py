@@ -2,23 +2,34 @@
 
 import logging
 
+from compute_backend import configure_backend
 from opinion_analyzer import OpinionAnalyzer
 from grpc_server import GRPCServer
+from topic_aggregate_store import TopicAggregateStore
+
+# Settings shared by the CSV analysis and the gRPC server, see OpinionAnalyzer.
+ANALYZER_OPTIONS = dict(
+    search_mode='exact',   # 'ann' for large topic sets
+    min_similarity=None,   # e.g. 0.3 leaves off-topic opinions without a topic
+)
 
 if __name__ == "__main__":
     logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
-    analyzer = OpinionAnalyzer()
+    configure_backend()  # 'cuda', 'cpu' or 'auto' from OPINION_ANALYZER_BACKEND
 
     user_input = input("Select an option:\n1 - Process CSV files\n2 - Test CSV files\n3 - Start gRPC Server\nEnter: ").strip()
 
     if user_input == '1':
+        analyzer = OpinionAnalyzer(**ANALYZER_OPTIONS)
         topic_path = '../data/train/topics.csv'
         opinion_path = '../data/train/opinions.csv'
-        analyzer.analyze_csv(topic_path, opinion_path)
+        analyzer.analyze_csv(topic_path, opinion_path, checkpoint_dir='checkpoints')
     elif user_input == '2':
         print("Currently unavailable.")
     elif user_input == '3':
-        grpc_server = GRPCServer()
+        grpc_server = GRPCServer(
+            warm_up=True, metrics_port=8000, aggregate_store=TopicAggregateStore(), analyzer_options=ANALYZER_OPTIONS
+        )
         grpc_server.start()
 
     else:
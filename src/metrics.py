@@ -0,0 +1,229 @@
+# metrics.py
+
+import bisect
+import importlib
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+try:
+    import resource
+except ImportError:  # Not available on Windows.
+    resource = None
+
+from compute_backend import get_backend
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+_lock = threading.Lock()
+_stages = {}
+_rpcs = {}
+
+
+class _Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class _StageStats:
+    def __init__(self):
+        self.calls = 0
+        self.items = 0
+        self.seconds = 0.0
+        self.min_batch = None
+        self.max_batch = 0
+        self.peak_rss_growth_bytes = 0
+        self.peak_gpu_growth_bytes = 0
+        self.latency = _Histogram()
+
+    def to_dict(self):
+        return {
+            'calls': self.calls,
+            'items': self.items,
+            'seconds': self.seconds,
+            'items_per_second': self.items / self.seconds if self.seconds else None,
+            'batch_size': {
+                'min': self.min_batch,
+                'mean': self.items / self.calls if self.calls else None,
+                'max': self.max_batch,
+            },
+            'peak_rss_growth_bytes': self.peak_rss_growth_bytes,
+            'peak_gpu_growth_bytes': self.peak_gpu_growth_bytes,
+        }
+
+
+def peak_memory():
+    """
+    Returns (peak resident set size of the process, peak allocated GPU memory) in bytes.
+    """
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024 if resource is not None else 0
+
+    gpu = 0
+    if get_backend().is_gpu:
+        gpu = importlib.import_module('torch').cuda.max_memory_allocated()
+    return rss, gpu
+
+
+def record_stage(name, items, seconds, peak_before=None):
+    """
+    Records one call of stage name. peak_before is peak_memory() taken when the call started;
+    the stage's peak growth is how far the call raised the process peaks, so a stage that
+    stays below an earlier peak records 0. Stages running concurrently share the growth.
+    """
+    rss, gpu = peak_memory()
+    rss_before, gpu_before = peak_before or (rss, gpu)
+    with _lock:
+        stats = _stages.setdefault(name, _StageStats())
+        stats.calls += 1
+        stats.items += items
+        stats.seconds += seconds
+        stats.min_batch = items if stats.min_batch is None else min(stats.min_batch, items)
+        stats.max_batch = max(stats.max_batch, items)
+        stats.peak_rss_growth_bytes = max(stats.peak_rss_growth_bytes, rss - rss_before)
+        stats.peak_gpu_growth_bytes = max(stats.peak_gpu_growth_bytes, gpu - gpu_before)
+        stats.latency.observe(seconds)
+
+
+@contextmanager
+def timed_stage(name, items=0):
+    """
+    Records the wall time of the enclosed block as one call of stage name processing items.
+    """
+    peak_before = peak_memory()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(name, items, time.perf_counter() - start, peak_before)
+
+
+def record_rpc(method, status, seconds):
+    with _lock:
+        _rpcs.setdefault((method, status), _Histogram()).observe(seconds)
+
+
+def reset():
+    with _lock:
+        _stages.clear()
+        _rpcs.clear()
+
+
+def run_report():
+    """
+    Returns the per-stage statistics, the process memory peaks and the RPC latencies recorded
+    so far as a JSON-ready dict.
+    """
+    rss, gpu = peak_memory()
+    with _lock:
+        return {
+            'process_peak_rss_bytes': rss,
+            'process_peak_gpu_bytes': gpu,
+            'stages': {name: stats.to_dict() for name, stats in _stages.items()},
+            'rpcs': {
+                f'{method} {status}': {'count': histogram.count, 'seconds': histogram.sum}
+                for (method, status), histogram in _rpcs.items()
+            },
+        }
+
+
+def write_run_report(path):
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump(run_report(), file, indent=2)
+    logging.info(f"Run report saved to {path}.")
+
+
+def _histogram_lines(name, labels, histogram):
+    lines = []
+    cumulative = 0
+    for bound, count in zip(histogram.buckets, histogram.counts):
+        cumulative += count
+        lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+    lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {histogram.count}')
+    lines.append(f'{name}_sum{{{labels}}} {histogram.sum}')
+    lines.append(f'{name}_count{{{labels}}} {histogram.count}')
+    return lines
+
+
+def prometheus_text():
+    """
+    Renders the recorded metrics in the Prometheus text exposition format.
+    """
+    lines = [
+        '# TYPE opinion_analyzer_stage_seconds histogram',
+        '# TYPE opinion_analyzer_stage_items_total counter',
+        '# TYPE opinion_analyzer_stage_max_batch_size gauge',
+        '# TYPE opinion_analyzer_stage_peak_rss_growth_bytes gauge',
+        '# TYPE opinion_analyzer_stage_peak_gpu_growth_bytes gauge',
+        '# TYPE opinion_analyzer_process_peak_rss_bytes gauge',
+        '# TYPE opinion_analyzer_process_peak_gpu_bytes gauge',
+        '# TYPE opinion_analyzer_rpc_seconds histogram',
+    ]
+    rss, gpu = peak_memory()
+    lines.append(f'opinion_analyzer_process_peak_rss_bytes {rss}')
+    lines.append(f'opinion_analyzer_process_peak_gpu_bytes {gpu}')
+    with _lock:
+        for name, stats in _stages.items():
+            labels = f'stage="{name}"'
+            lines.extend(_histogram_lines('opinion_analyzer_stage_seconds', labels, stats.latency))
+            lines.append(f'opinion_analyzer_stage_items_total{{{labels}}} {stats.items}')
+            lines.append(f'opinion_analyzer_stage_max_batch_size{{{labels}}} {stats.max_batch}')
+            lines.append(f'opinion_analyzer_stage_peak_rss_growth_bytes{{{labels}}} {stats.peak_rss_growth_bytes}')
+            lines.append(f'opinion_analyzer_stage_peak_gpu_growth_bytes{{{labels}}} {stats.peak_gpu_growth_bytes}')
+        for (method, status), histogram in _rpcs.items():
+            lines.extend(_histogram_lines('opinion_analyzer_rpc_seconds', f'method="{method}",status="{status}"', histogram))
+    return '\n'.join(lines) + '\n'
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+
+        body = prometheus_text().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logging.debug(f"Metrics request: {format % args}")
+
+
+class MetricsServer:
+    def __init__(self, port=8000, host='127.0.0.1'):
+        """
+        Serves the recorded metrics at http://host:port/metrics on a background thread.
+
+        Parameters:
+        - port: Listening port.
+        - host: Listening address; local only by default.
+        """
+        self.address = (host, port)
+        self._server = None
+        self._thread = None
+
+    def start(self):
+        self._server = ThreadingHTTPServer(self.address, _MetricsHandler)
+        self._thread = threading.Thread(target=self._server.serve_forever, name='metrics-server', daemon=True)
+        self._thread.start()
+        logging.info(f"Metrics served at http://{self.address[0]}:{self.address[1]}/metrics")
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._thread.join()
+            self._server = None
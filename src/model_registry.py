@@ -0,0 +1,43 @@
+# model_registry.py
+
+import logging
+import threading
+import time
+
+_models = {}
+_loading_locks = {}
+_lock = threading.Lock()
+
+
+def get_model(key, loader):
+    """
+    Returns the model registered under key, calling loader() to build it on first use. Every
+    component of the process asks for its models here, so each model is loaded at most once
+    no matter how many analyzers are created.
+
+    Parameters:
+    - key: Hashable identifier, e.g. (kind, model name, device).
+    - loader: Zero-argument callable returning the loaded model.
+    """
+    with _lock:
+        model = _models.get(key)
+        if model is not None:
+            return model
+        loading_lock = _loading_locks.setdefault(key, threading.Lock())
+
+    # Loads of different models may overlap; loads of the same model wait for each other.
+    with loading_lock:
+        model = _models.get(key)
+        if model is None:
+            logging.info(f"Loading model {key}...")
+            start = time.perf_counter()
+            model = loader()
+            logging.info(f"Model {key} loaded in {time.perf_counter() - start:.1f}s.")
+            with _lock:
+                _models[key] = model
+    return model
+
+
+def loaded_models():
+    with _lock:
+        return list(_models)
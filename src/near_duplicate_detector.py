@@ -0,0 +1,98 @@
+# near_duplicate_detector.py
+
+import hashlib
+
+import numpy as np
+
+_PRIME = np.uint64(4294967311)  # Smallest prime above 2**32.
+
+
+class NearDuplicateDetector:
+    def __init__(self, num_perm=64, bands=16, shingle_size=2, threshold=0.7, seed=0):
+        """
+        Clusters near-identical texts with MinHash signatures and locality-sensitive hashing.
+
+        Parameters:
+        - num_perm: MinHash signature length.
+        - bands: LSH bands; texts sharing all rows of any band become candidates.
+        - shingle_size: Words per shingle.
+        - threshold: Minimum estimated Jaccard similarity for a candidate to join a cluster.
+        - seed: Seed of the hash permutations.
+        """
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands.")
+
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self.threshold = threshold
+
+        random_state = np.random.RandomState(seed)
+        self._a = random_state.randint(1, 2 ** 32, size=(num_perm, 1), dtype=np.uint64)
+        self._b = random_state.randint(0, 2 ** 32, size=(num_perm, 1), dtype=np.uint64)
+
+    def signature(self, text):
+        words = text.split()
+        shingles = {
+            ' '.join(words[i:i + self.shingle_size])
+            for i in range(max(1, len(words) - self.shingle_size + 1))
+        }
+        hashes = np.fromiter(
+            (int.from_bytes(hashlib.blake2b(s.encode('utf-8'), digest_size=4).digest(), 'little') for s in shingles),
+            dtype=np.uint64,
+            count=len(shingles)
+        )
+        return ((self._a * hashes + self._b) % _PRIME).min(axis=1)
+
+    def cluster(self, texts):
+        """
+        Returns (representatives, cluster_of): the index of the first text of every cluster, in
+        order of appearance, and for each text the position of its cluster in representatives.
+        """
+        signatures = np.stack([self.signature(text) for text in texts]) if texts else np.empty((0, self.num_perm))
+        parent = list(range(len(texts)))
+
+        def find(i):
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        for band in range(self.bands):
+            buckets = {}
+            band_rows = signatures[:, band * self.rows:(band + 1) * self.rows]
+            for i, row in enumerate(band_rows):
+                anchor = buckets.setdefault(row.tobytes(), i)
+                if anchor == i:
+                    continue
+                root_i, root_anchor = find(i), find(anchor)
+                if root_i == root_anchor:
+                    continue
+                if np.mean(signatures[i] == signatures[anchor]) >= self.threshold:
+                    # Keep the earliest text as the root so it becomes the representative.
+                    parent[max(root_i, root_anchor)] = min(root_i, root_anchor)
+
+        representatives = []
+        position = {}
+        cluster_of = []
+        for i in range(len(texts)):
+            root = find(i)
+            if root not in position:
+                position[root] = len(representatives)
+                representatives.append(i)
+            cluster_of.append(position[root])
+
+        return representatives, cluster_of
+
+    def collapse(self, texts):
+        """
+        Returns (representative texts, members, cluster_of) where members[k] lists every text
+        in the cluster of representative k in input order, representative first, and cluster_of
+        is the cluster of every text as cluster returns it.
+        """
+        representatives, cluster_of = self.cluster(texts)
+        members = [[] for _ in representatives]
+        for text, cluster in zip(texts, cluster_of):
+            members[cluster].append(text)
+        return [texts[i] for i in representatives], members, cluster_of
@@ -1,207 +1,494 @@
 # opinion_analyzer.py
 
 import logging
-import cudf
-import os
-from datasets import Dataset
-from datetime import datetime
+import time
 
+from checkpoint_store import CheckpointStore, run_batches
+from classified_comments import ClassifiedComments
 from comment_classifier import CommentClassifier
+from compute_backend import get_backend
 from conclusion_generator import ConclusionGenerator
 from gpu_resource_manager import GPUResourceManager
+from metrics import peak_memory, record_stage, timed_stage
+from near_duplicate_detector import NearDuplicateDetector
+from output_writer import InputOrderWriter, OutputSink
+from quantization import quantized_models
+from result_cache import ResultCache
+from sharded_executor import ShardedExecutor
+from stage_pipeline import StagePipeline
 from text_preprocessor import TextPreprocessor
+from topic_accumulator import TopicAccumulator
 from topic_similarity_calculator import TopicSimilarityCalculator
 
 
 class OpinionAnalyzer:
-    def __init__(self):
+    def __init__(self, classification_mode='zero-shot', first_stage='centroid', escalation_threshold=0.6,
+                 summarization_mode='comment', result_cache=None, collapse_near_duplicates=False,
+                 output_format='csv', output_dir='outputs', quantize=None, aggregate_store=None,
+                 search_mode='exact', min_similarity=None, search_options=None):
+        """
+        Parameters:
+        - classification_mode, first_stage, escalation_threshold: See CommentClassifier.
+        - summarization_mode: See ConclusionGenerator.
+        - result_cache: ResultCache shared by all models. None uses an in-memory cache,
+          False disables caching.
+        - collapse_near_duplicates: Run the models on one representative per cluster of
+          near-identical opinions (True, or a configured NearDuplicateDetector).
+        - output_format: 'csv', 'parquet' or 'arrow' for the opinions and conclusions files.
+        - output_dir: Directory of the timestamped output files.
+        - quantize: Models to run with int8 dynamic quantization on CPU, a subset of
+          ('embedding', 'classifier', 'summarizer') or True for all. None reads
+          OPINION_ANALYZER_QUANTIZE.
+        - aggregate_store: Optional TopicAggregateStore whose per-topic counters are updated
+          with every classified batch.
+        - search_mode, min_similarity: See TopicSimilarityCalculator.
+        - search_options: Extra TopicSearchEngine options (block sizes, n_clusters, n_probe...).
+        """
+        if output_format not in OutputSink.FORMATS:
+            raise ValueError(f"Unknown output format: {output_format}. Expected one of {tuple(OutputSink.FORMATS)}.")
+        self.output_format = output_format
+        self.output_dir = output_dir
+        self.aggregate_store = aggregate_store
+        self.backend = get_backend()
+        if collapse_near_duplicates is True:
+            collapse_near_duplicates = NearDuplicateDetector()
+        self.near_duplicate_detector = collapse_near_duplicates or None
+        self.result_cache = ResultCache() if result_cache is None else (result_cache or None)
         self.preprocessor = TextPreprocessor()
-        self.similarity_calculator = TopicSimilarityCalculator()
-        self.comment_classifier = CommentClassifier()
-        self.conclusion_generator = ConclusionGenerator()
+        quantize = quantized_models(quantize)
+        self.similarity_calculator = TopicSimilarityCalculator(
+            search_mode=search_mode,
+            min_similarity=min_similarity,
+            result_cache=self.result_cache,
+            quantize='embedding' in quantize,
+            **(search_options or {})
+        )
+        self.comment_classifier = CommentClassifier(
+            mode=classification_mode,
+            first_stage=first_stage,
+            escalation_threshold=escalation_threshold,
+            encoder=self.similarity_calculator,
+            result_cache=self.result_cache,
+            quantize='classifier' in quantize,
+            preprocessor=self.preprocessor
+        )
+        self.conclusion_generator = ConclusionGenerator(
+            mode=summarization_mode,
+            encoder=self.similarity_calculator,
+            result_cache=self.result_cache,
+            quantize='summarizer' in quantize
+        )
+
+    def warm_up(self):
+        """
+        Loads every model and runs one tiny analysis, so the first real request pays for
+        neither model loading nor first-call initialization. Models otherwise load on first use.
+        """
+        logging.info("Warming up models...")
+        start = time.perf_counter()
+
+        self.similarity_calculator.load()
+        self.comment_classifier.load()
+        self.conclusion_generator.load()
+        self.comment_classifier.learning = False
+        try:
+            self.analyze_grpc_batch(
+                [(["warm up topic"], ["this short opinion warms up every model"])], aggregate=False
+            )
+        finally:
+            self.comment_classifier.learning = True
+
+        logging.info(f"Warm-up completed in {time.perf_counter() - start:.1f}s.")
 
     def load_data(self, topic_path, opinion_path):
-        topics_df = cudf.read_csv(topic_path)
-        self.topics_rw = topics_df['text'].to_pandas().tolist()
+        peak_before = peak_memory()
+        start = time.perf_counter()
+        topics_df = self.backend.read_csv(topic_path)
+        self.topics_rw = self.backend.column_to_list(topics_df, 'text')
 
-        opinion_df = cudf.read_csv(opinion_path)
-        self.opinions_rw = opinion_df['text'].to_pandas().tolist()
+        opinion_df = self.backend.read_csv(opinion_path)
+        self.opinions_rw = self.backend.column_to_list(opinion_df, 'text')
+        record_stage('load', len(self.topics_rw) + len(self.opinions_rw), time.perf_counter() - start, peak_before)
 
         logging.info("Files loaded successfully.")
 
-    def save_conclusions_data(self, conclusions):
+    def open_output(self):
+        return OutputSink(self.output_dir, self.output_format)
+
+    def save_conclusions_data(self, conclusions, sink):
         try:
             if not conclusions:
                 logging.warning("No conclusions data available to save.")
                 return
 
-            topics = []
-            summaries = []
-            effectivenesses = []
+            sink.write_conclusions(conclusions)
 
-            now = datetime.now()
-            timestamp = now.strftime("%Y%m%d_%H%M%S")
+        except Exception as e:
+            logging.error(f"An error occurred while saving data: {e}")
 
-            for topic, effectiveness, summary_list in conclusions:
-                topics.append(topic)
-                summaries.append(' '.join(summary_list))
-                effectivenesses.append(effectiveness)
+    def record_aggregates(self, comments):
+        if self.aggregate_store is not None:
+            self.aggregate_store.add(comments)
 
-            df = cudf.DataFrame({
-                'topic': topics,
-                'summary': summaries,
-                'effectiveness': effectivenesses
-            })
+    def preprocess_texts(self, texts):
+        with timed_stage('preprocess', len(texts)):
+            return [text for text in self.preprocessor.preprocess_batch(texts) if text is not None]
 
-            save_dir = 'outputs'
-            if save_dir and not os.path.exists(save_dir):
-                os.makedirs(save_dir, exist_ok=True)
+    def preprocess_data(self):
+        logging.info("Preprocessing topics and opinions...")
 
-            save_path = os.path.join(save_dir, f'conclusions_{timestamp}.csv')
+        self.topics = self.preprocess_texts(self.topics_rw)
+        self.opinions = self.preprocess_texts(self.opinions_rw)
+
+    def collapse_opinions(self, opinions):
+        """
+        Returns (representatives, members, cluster_of), see NearDuplicateDetector.collapse.
+        Without a near-duplicate detector every opinion is its own representative and members
+        and cluster_of are None.
+        """
+        if self.near_duplicate_detector is None:
+            return opinions, None, None
+
+        with timed_stage('collapse', len(opinions)):
+            representatives, members, cluster_of = self.near_duplicate_detector.collapse(opinions)
+        logging.info(f"Collapsed {len(opinions)} opinions into {len(representatives)} near-duplicate clusters.")
+        return representatives, members, cluster_of
+
+    def classify_segments(self, segments, batch_size=8192, checkpoint=None, collapse=True, sink=None,
+                          accumulator=None):
+        """
+        Classifies the opinions of several independent (topics, opinions) segments in shared
+        model batches. Each opinion is only matched against its own segment's topics.
+        Returns one ClassifiedComments per segment. When near-duplicates are collapsed, each
+        comment stands for its whole cluster. With a CheckpointStore, batches finished by an
+        earlier run are read back instead of classified again. collapse=False skips
+        near-duplicate collapsing for opinions that are already representatives.
+
+        With an OutputSink (one segment only), nothing is returned and only the labels are kept:
+        every completed batch is written to sink in input order and added to accumulator (a
+        TopicAccumulator, for the conclusions) and to the aggregate store.
+        """
+        if sink is not None and len(segments) != 1:
+            raise ValueError("Classifying into a sink takes exactly one segment.")
+
+        all_opinions = []
+        all_members = []
+        boundaries = []
+        start = 0
+        for topics, opinions in segments:
+            representatives, members, cluster_of = (
+                self.collapse_opinions(opinions) if collapse else (opinions, None, None)
+            )
+            all_opinions.extend(representatives)
+            all_members.extend(members or [None] * len(representatives))
+            boundaries.append((start, start + len(representatives), topics, cluster_of))
+            start += len(representatives)
 
-            logging.info(f"Conclusions saving to {save_path}...")
+        total_batches = (len(all_opinions) + batch_size - 1) // batch_size
 
-            df.to_csv(save_path, index=False)
+        def classify_batch(i, batch_end):
+            logging.info(f"Processing batch {i // batch_size + 1}/{total_batches}...")
 
-            logging.info(f"Conclusions successfully saved to {save_path}.")
+            batch_comments = all_opinions[i:batch_end]
+            comment_embeddings = self.similarity_calculator.encode_comments(batch_comments)
 
-        except Exception as e:
-            logging.error(f"An error occurred while saving data: {e}")
+            classifications = self.comment_classifier.classify_comments_batch(
+                batch_comments, embeddings=comment_embeddings
+            )
 
-    def save_opinions_data(self, comments):
-        try:
-            if not comments:
-                logging.warning("No opinions data available to save.")
-                return
+            related_topics = []
+            for begin, end, topics, _ in boundaries:
+                lo, hi = max(begin, i), min(end, batch_end)
+                if lo >= hi:
+                    continue
 
-            opinions = []
-            topics = []
-            types = []
+                related_topics.extend(self.similarity_calculator.get_topics_by_similarity_batch(
+                    all_opinions[lo:hi], topics, comment_embeddings=comment_embeddings[lo - i:hi - i]
+                ))
 
-            now = datetime.now()
-            timestamp = now.strftime("%Y%m%d_%H%M%S")
+            del comment_embeddings
+            logging.info("Batch processing completed.")
+            return [[topic, classification] for topic, classification in zip(related_topics, classifications)]
+
+        # A failed classification labels its whole batch None; such batches are retried on resume.
+        on_batch = None
+        if sink is not None:
+            writer = InputOrderWriter(sink, segments[0][1], boundaries[0][3])
+
+            def on_batch(start, end, outputs):
+                self._write_batch(ClassifiedComments.from_columns(
+                    all_opinions[start:end],
+                    [topic for topic, _ in outputs],
+                    [classification for _, classification in outputs],
+                    all_members[start:end]
+                ), writer, accumulator)
+
+        labeled = run_batches(
+            len(all_opinions), batch_size, classify_batch, checkpoint, 'classify',
+            is_complete=lambda outputs: all(classification is not None for _, classification in outputs),
+            on_batch=on_batch
+        )
 
-            for comment in comments:
-                opinions.append(comment['text'])
-                topics.append(comment['topic'])
-                types.append(comment['type'])
+        if self.comment_classifier.mode == 'cascade':
+            hit_rates = self.comment_classifier.stage_hit_rates()
+            logging.info(
+                f"Cascade hit rates: first stage {hit_rates['first_stage']:.2%}, "
+                f"escalated {hit_rates['escalated']:.2%}."
+            )
 
-            df = cudf.DataFrame({
-                'opinion': opinions,
-                'topic': topics,
-                'type': types
-            })
+        if self.result_cache is not None:
+            self.result_cache.log_stats()
+
+        if sink is not None:
+            logging.info("All batches processed.")
+            GPUResourceManager.clear_gpu_memory()
+            return None
+
+        results = [
+            ClassifiedComments.from_columns(
+                all_opinions[begin:end],
+                [topic for topic, _ in labeled[begin:end]],
+                [classification for _, classification in labeled[begin:end]],
+                all_members[begin:end],
+                cluster_of
+            )
+            for begin, end, _, cluster_of in boundaries
+        ]
 
-            save_dir = 'outputs'
-            if save_dir and not os.path.exists(save_dir):
-                os.makedirs(save_dir, exist_ok=True)
+        logging.info("All batches processed.")
+        GPUResourceManager.clear_gpu_memory()
+        return results
+
+    def _write_batch(self, comments, writer, accumulator):
+        writer.write(comments)
+        if accumulator is not None:
+            accumulator.add(comments)
+        self.record_aggregates(comments)
+
+    def batch_process_comments(self, batch_size=8192, checkpoint=None):
+        self.classified_comments = self.classify_segments(
+            [(self.topics, self.opinions)], batch_size, checkpoint
+        )[0]
+
+    def checkpoint_config(self, batch_size=8192):
+        """
+        Settings that change what a checkpointed batch contains; part of the checkpoint key.
+        """
+        detector = self.near_duplicate_detector
+        calculator = self.similarity_calculator
+        return '|'.join(str(value) for value in (
+            self.comment_classifier.cache_config,
+            self.conclusion_generator.mode,
+            self.conclusion_generator.cache_config,
+            calculator.cache_config,
+            calculator.search_engine.mode,
+            calculator.min_similarity,
+            detector and (detector.num_perm, detector.bands, detector.shingle_size, detector.threshold),
+            batch_size,
+        ))
+
+    def analyze_csv(self, topic_path, opinion_path, checkpoint_dir=None):
+        """
+        Parameters:
+        - checkpoint_dir: When set, completed classification and summarization batches are
+          recorded under a key derived from the input files and settings, and a rerun on the
+          same inputs continues from the last completed batch of each stage. The checkpoint is
+          removed once the outputs are saved.
+
+        Opinions are written as their classification batches complete; only their labels and
+        the per-topic texts and type counts the conclusions need stay in memory.
+        """
+        logging.info("Starting the main process...")
 
-            save_path = os.path.join(save_dir, f'opinions_{timestamp}.csv')
+        checkpoint = None
+        if checkpoint_dir:
+            checkpoint = CheckpointStore.open(checkpoint_dir, [topic_path, opinion_path], self.checkpoint_config())
 
-            logging.info(f"Opinions saving to {save_path}...")
+        self.load_data(topic_path, opinion_path)
+        self.preprocess_data()
 
-            df.to_csv(save_path, index=False)
+        sink = self.open_output()
+        try:
+            # Every comment of a topic is kept, so the summaries cover all of them.
+            accumulator = TopicAccumulator(max_comments_per_topic=None)
+            self.classify_segments(
+                [(self.topics, self.opinions)], checkpoint=checkpoint, sink=sink, accumulator=accumulator
+            )
+            if not sink.rows_written:
+                logging.warning("No opinions data available to save.")
 
-            logging.info(f"Opinions successfully saved to {save_path}.")
+            logging.info("Generating conclusions...")
 
-        except Exception as e:
-            logging.error(f"An error occurred while saving data: {e}")
+            conclusions = accumulator.conclusions(self.conclusion_generator, checkpoint=checkpoint)
+            self.save_conclusions_data(conclusions, sink)
+            sink.write_report()
+        finally:
+            sink.close()
 
-    def preprocess_data(self):
-        logging.info("Preprocessing topics and opinions...")
+        if checkpoint is not None:
+            checkpoint.remove()
 
-        dataset_topic = (
-            Dataset.from_dict({'topic': self.topics_rw})
-            .map(lambda x: {'topic': self.preprocessor.preprocess_text(x['topic'])})
-            .filter(lambda x: x['topic'] is not None)
-        )
+        # If desired, print conclusions
+        # for topic, effectiveness, topic_summaries in conclusions:
+        #     print(f"Topic: {topic}\nEffectiveness: {effectiveness}\nSummary: {' '.join(topic_summaries)}\n")
 
-        dataset_opinion = (
-            Dataset.from_dict({'opinion': self.opinions_rw})
-            .map(lambda x: {'opinion': self.preprocessor.preprocess_text(x['opinion'])})
-            .filter(lambda x: x['opinion'] is not None)
-            # .take(500)  # Optional: limit for testing
-        )
+        logging.info("Process completed.")
+
+    def analyze_csv_sharded(self, topic_path, opinion_path, workers=None, threads_per_worker=None,
+                            batch_size=8192):
+        """
+        CPU variant of analyze_csv that spreads classification and summarization over forked
+        worker processes sharing this process's models copy-on-write. Produces the same outputs
+        as analyze_csv, except in cascade mode with the centroid first stage: the workers keep
+        the centroids they were forked with instead of refitting them from escalated labels.
+        See ShardedExecutor for workers and threads_per_worker.
+        """
+        logging.info("Starting the sharded process...")
 
-        self.topics = dataset_topic['topic']
-        self.opinions = dataset_opinion['opinion']
+        self.load_data(topic_path, opinion_path)
+        self.preprocess_data()
 
-    def batch_process_comments(self, batch_size=8192):
-        self.classified_comments = []
+        sink = self.open_output()
+        executor = ShardedExecutor(self, workers, threads_per_worker)
+        try:
+            representatives, members, cluster_of = self.collapse_opinions(self.opinions)
+            writer = InputOrderWriter(sink, self.opinions, cluster_of)
+            accumulator = TopicAccumulator(max_comments_per_topic=None)
+            start = 0
+            for comments in executor.classify_shards(self.topics, representatives, batch_size):
+                if members is not None:
+                    comments = ClassifiedComments.concat([comments], members[start:start + len(comments)])
+                start += len(comments)
+                self._write_batch(comments, writer, accumulator)
+            if not sink.rows_written:
+                logging.warning("No opinions data available to save.")
 
-        total_batches = (len(self.opinions) + batch_size - 1) // batch_size
-        for i in range(0, len(self.opinions), batch_size):
-            batch_number = i // batch_size + 1
-            logging.info(f"Processing batch {batch_number}/{total_batches}...")
+            logging.info("Generating conclusions...")
 
-            batch_comments = self.opinions[i:i + batch_size]
+            conclusions = accumulator.conclusions(self.conclusion_generator, summarize_texts=executor.summarize_texts)
+            self.save_conclusions_data(conclusions, sink)
+            sink.write_report()
+        finally:
+            executor.close()
+            sink.close()
 
-            if not batch_comments:
-                logging.warning("Skipping empty batch.")
-                continue
+        logging.info("Process completed.")
 
+    def analyze_csv_streaming(self, topic_path, opinion_path, chunk_size=8192, queue_depth=2,
+                              max_comments_per_topic=256):
+        """
+        Streaming variant of analyze_csv for corpora that do not fit in memory. The opinions CSV
+        is read in chunks that flow through preprocessing, embedding/topic matching and
+        classification on separate threads connected by queues of queue_depth chunks.
+        Classified opinions are appended to the output file as chunks finish; conclusions use
+        exact per-topic counts and a sample of max_comments_per_topic comments per topic.
+        """
+        logging.info("Starting the streaming process...")
+
+        topics_df = self.backend.read_csv(topic_path)
+        topics = self.preprocess_texts(self.backend.column_to_list(topics_df, 'text'))
+        accumulator = TopicAccumulator(max_comments_per_topic)
+
+        def match_topics(collapsed):
+            opinions, members, cluster_of = collapsed
+            if not opinions:
+                return opinions, members, cluster_of, [], None
+            embeddings = self.similarity_calculator.encode_comments(opinions)
             related_topics = self.similarity_calculator.get_topics_by_similarity_batch(
-                batch_comments, self.topics
+                opinions, topics, comment_embeddings=embeddings
             )
+            return opinions, members, cluster_of, related_topics, embeddings
+
+        def classify(item):
+            opinions, members, cluster_of, related_topics, embeddings = item
+            if not opinions:
+                return ClassifiedComments()
+            classifications = self.comment_classifier.classify_comments_batch(opinions, embeddings=embeddings)
+            return ClassifiedComments.from_columns(opinions, related_topics, classifications, members, cluster_of)
+
+        pipeline = StagePipeline(
+            self.backend.read_csv_chunks(opinion_path, 'text', chunk_size),
+            [
+                ('preprocess', self.preprocess_texts),
+                ('collapse', self.collapse_opinions),
+                ('match_topics', match_topics),
+                ('classify', classify),
+            ],
+            queue_depth
+        )
 
-            classifications = self.comment_classifier.classify_comments_batch(batch_comments)
+        sink = self.open_output()
+        try:
+            for chunk_number, classified_comments in enumerate(pipeline.run(), 1):
+                sink.write_opinions(classified_comments)
+                accumulator.add(classified_comments)
+                self.record_aggregates(classified_comments)
+                logging.info(f"Chunk {chunk_number} completed ({sink.rows_written} opinions so far).")
 
-            for comment, topic, classification in zip(batch_comments, related_topics, classifications):
-                self.classified_comments.append({
-                    "text": comment,
-                    "topic": topic,
-                    "type": classification
-                })
+            logging.info("Generating conclusions...")
 
-            logging.info("Batch processing completed.")
+            conclusions = accumulator.conclusions(self.conclusion_generator)
+            self.save_conclusions_data(conclusions, sink)
+            sink.write_report()
+        finally:
+            sink.close()
 
-        logging.info("All batches processed.")
-        GPUResourceManager.clear_gpu_memory()
-
-    def analyze_csv(self, topic_path, opinion_path):
-        logging.info("Starting the main process...")
+        logging.info("Process completed.")
 
-        self.load_data(topic_path, opinion_path)
-        self.preprocess_data()
-        self.batch_process_comments()
+    def analyze_grpc_batch(self, requests, with_conclusions=None, aggregate=True):
+        """
+        Analyzes several (topics, opinions) requests together without touching instance state,
+        so it is safe to call for concurrent gRPC requests. Returns one
+        (opinions_result, topics_result) pair per request. with_conclusions optionally flags,
+        per request, whether summaries and effectiveness are generated; topics_result stays
+        empty for requests that skip them. aggregate=False keeps the opinions out of
+        the aggregate store.
+        """
+        logging.info(f"Starting the main process for {len(requests)} request(s)...")
+
+        segments = [
+            (self.preprocess_texts(topics), self.preprocess_texts(opinions))
+            for topics, opinions in requests
+        ]
+        classified_segments = self.classify_segments(segments)
 
         logging.info("Generating conclusions...")
 
-        conclusions = self.conclusion_generator.generate_conclusions(self.classified_comments)
-
-        self.save_opinions_data(self.classified_comments)
-        self.save_conclusions_data(conclusions)
+        if with_conclusions is None:
+            with_conclusions = [True] * len(requests)
+        conclusion_segments = self.conclusion_generator.generate_conclusions_batch([
+            classified_comments if wanted else ClassifiedComments()
+            for classified_comments, wanted in zip(classified_segments, with_conclusions)
+        ])
 
-        # If desired, print conclusions
-        # for topic, effectiveness, topic_summaries in conclusions:
-        #     print(f"Topic: {topic}\nEffectiveness: {effectiveness}\nSummary: {' '.join(topic_summaries)}\n")
+        # Recorded once everything succeeded, so a batch that fails and is rerun counts once.
+        if aggregate:
+            for classified_comments in classified_segments:
+                self.record_aggregates(classified_comments)
 
-        logging.info("Process completed.")
+        results = []
+        for classified_comments, conclusions in zip(classified_segments, conclusion_segments):
+            opinions_result = list(classified_comments.rows())
 
-    def analyze_grpc(self, topics, opinions):
-        logging.info("Starting the main process...")
+            topics_result = [
+                (topic, summary, effectiveness)
+                for topic, effectiveness, summary_list in conclusions
+                for summary in summary_list
+            ]
 
-        self.topics_rw = topics
-        self.opinions_rw = opinions
+            results.append((opinions_result, topics_result))
 
-        self.preprocess_data()
-        self.batch_process_comments()
-
-        logging.info("Generating conclusions...")
-
-        conclusions = self.conclusion_generator.generate_conclusions(self.classified_comments)
-
-        opinions_result = [
-            (comment['text'], comment['topic'], comment['type'])
-            for comment in self.classified_comments
-        ]
+        logging.info("Process completed.")
 
-        topics_result = [
-            (topic, summary, effectiveness)
-            for topic, effectiveness, summary_list in conclusions
-            for summary in summary_list
-        ]
+        return results
 
-        logging.info("Process completed.")
+    def validate_request(self, topics, opinions):
+        """
+        Raises ValueError if a (topics, opinions) request cannot be analyzed: opinions sent
+        without any topic left after preprocessing.
+        """
+        if opinions and not any(self.preprocessor.preprocess_batch(topics, processes=1)):
+            raise ValueError("No topic is left after preprocessing; send at least one non-empty topic.")
 
-        return opinions_result, topics_result
+    def analyze_grpc(self, topics, opinions):
+        return self.analyze_grpc_batch([(topics, opinions)])[0]
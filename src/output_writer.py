@@ -0,0 +1,266 @@
+# output_writer.py
+
+import csv
+import importlib
+import logging
+import os
+from datetime import datetime
+
+import numpy as np
+
+from classified_comments import ClassifiedComments
+from metrics import timed_stage, write_run_report
+
+
+def expanded_columns(comments):
+    """
+    Returns the (texts, topic_codes, type_codes) columns of a ClassifiedComments batch with
+    collapsed clusters expanded to one row per member, in input order when it is known.
+    """
+    if comments.members is None:
+        return comments.texts, comments.topic_codes, comments.type_codes
+
+    order = comments.expanded_order()
+    return comments.expanded_texts(), comments.topic_codes[order], comments.type_codes[order]
+
+
+class CSVOpinionsWriter:
+    COLUMNS = ['opinion', 'topic', 'type']
+
+    def __init__(self, path):
+        """
+        Appends classified opinions to a CSV file batch by batch.
+
+        Parameters:
+        - path: Output file; it is created (or truncated) with a header row.
+        """
+        self.path = path
+        self.rows_written = 0
+        self._file = open(path, 'w', newline='', encoding='utf-8')
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(self.COLUMNS)
+
+    def write_batch(self, comments):
+        rows = [(text, topic or '', comment_type) for text, topic, comment_type in comments.rows()]
+        self._writer.writerows(rows)
+        self._file.flush()
+        self.rows_written += len(rows)
+
+    @staticmethod
+    def write_conclusions(path, conclusions):
+        with open(path, 'w', newline='', encoding='utf-8') as file:
+            writer = csv.writer(file)
+            writer.writerow(['topic', 'summary', 'effectiveness'])
+            writer.writerows(
+                (topic, ' '.join(summaries), effectiveness) for topic, effectiveness, summaries in conclusions
+            )
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+            logging.info(f"Opinions successfully saved to {self.path} ({self.rows_written} rows).")
+
+
+class ArrowOpinionsWriter:
+    def __init__(self, path):
+        """
+        Appends classified opinions to an Arrow IPC stream, one record batch per write. The
+        topic and type columns are dictionary-encoded straight from the ClassifiedComments codes.
+
+        Parameters:
+        - path: Output file; it is created (or truncated).
+        """
+        self.pa = importlib.import_module('pyarrow')
+        self.path = path
+        self.rows_written = 0
+        self.schema = self.pa.schema([
+            ('opinion', self.pa.string()),
+            ('topic', self.pa.dictionary(self.pa.int32(), self.pa.string())),
+            ('type', self.pa.dictionary(self.pa.int32(), self.pa.string())),
+        ])
+        self._open()
+
+    def _open(self):
+        self._sink = self.pa.OSFile(self.path, 'wb')
+        self._writer = self.pa.ipc.new_stream(self._sink, self.schema)
+
+    def _write(self, batch):
+        self._writer.write_batch(batch)
+
+    def _dictionary_column(self, codes, vocabulary):
+        return self.pa.DictionaryArray.from_arrays(
+            self.pa.array(codes, type=self.pa.int32(), mask=codes < 0),
+            self.pa.array(vocabulary, type=self.pa.string())
+        )
+
+    def write_batch(self, comments):
+        if not len(comments):
+            return
+
+        texts, topic_codes, type_codes = expanded_columns(comments)
+        batch = self.pa.RecordBatch.from_arrays([
+            self.pa.array(texts, type=self.pa.string()),
+            self._dictionary_column(topic_codes, comments.topics),
+            self._dictionary_column(type_codes, comments.types),
+        ], schema=self.schema)
+
+        self._write(batch)
+        self.rows_written += batch.num_rows
+
+    @staticmethod
+    def conclusions_table(conclusions):
+        pa = importlib.import_module('pyarrow')
+        return pa.table({
+            'topic': pa.array([topic for topic, _, _ in conclusions], type=pa.string()),
+            'summary': pa.array([' '.join(summaries) for _, _, summaries in conclusions], type=pa.string()),
+            'effectiveness': pa.array(
+                [effectiveness for _, effectiveness, _ in conclusions], type=pa.string()
+            ).dictionary_encode(),
+        })
+
+    @classmethod
+    def write_conclusions(cls, path, conclusions):
+        pa = importlib.import_module('pyarrow')
+        table = cls.conclusions_table(conclusions)
+        with pa.OSFile(path, 'wb') as sink, pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            if self._sink is not None:
+                self._sink.close()
+            self._writer = None
+            logging.info(f"Opinions successfully saved to {self.path} ({self.rows_written} rows).")
+
+
+class ParquetOpinionsWriter(ArrowOpinionsWriter):
+    """
+    Appends classified opinions to a Parquet file, one row group per write, keeping the
+    dictionary encoding of the topic and type columns.
+    """
+
+    def _open(self):
+        self.pq = importlib.import_module('pyarrow.parquet')
+        self._sink = None
+        self._writer = self.pq.ParquetWriter(self.path, self.schema)
+
+    def _write(self, batch):
+        self._writer.write_table(self.pa.Table.from_batches([batch]))
+
+    @classmethod
+    def write_conclusions(cls, path, conclusions):
+        importlib.import_module('pyarrow.parquet').write_table(cls.conclusions_table(conclusions), path)
+
+
+class InputOrderWriter:
+    def __init__(self, sink, opinions, cluster_of=None):
+        """
+        Writes opinions to an OutputSink in input order while their near-duplicate cluster
+        representatives are classified batch by batch. Only the topic and type of every
+        representative are kept; each opinion is written once its representative and those of
+        all earlier opinions are classified.
+
+        Parameters:
+        - sink: OutputSink receiving the opinions.
+        - opinions: Every opinion text, in input order.
+        - cluster_of: Cluster of every opinion as NearDuplicateDetector.cluster returns it;
+          None when every opinion is its own representative.
+        """
+        self.sink = sink
+        self.opinions = opinions
+        self.cluster_of = None if cluster_of is None else np.asarray(cluster_of, np.int64)
+        # Clusters are numbered by first appearance, so the opinions before the first one of
+        # cluster k all belong to clusters below k.
+        self._first = None if cluster_of is None else np.unique(self.cluster_of, return_index=True)[1]
+        self.topics = []
+        self.types = []
+        self.written = 0
+
+    def write(self, comments):
+        """
+        Takes the labels of the next representatives from a ClassifiedComments batch and writes
+        every opinion they complete.
+        """
+        topics = comments.topics + [None]  # Code -1 picks the appended None.
+        types = comments.types + [None]
+        self.topics.extend(topics[code] for code in comments.topic_codes.tolist())
+        self.types.extend(types[code] for code in comments.type_codes.tolist())
+
+        classified = len(self.topics)
+        if self.cluster_of is None:
+            end = classified
+            clusters = range(self.written, end)
+        else:
+            end = int(self._first[classified]) if classified < len(self._first) else len(self.opinions)
+            clusters = self.cluster_of[self.written:end].tolist()
+        if end <= self.written:
+            return
+
+        self.sink.write_opinions(ClassifiedComments.from_columns(
+            self.opinions[self.written:end],
+            [self.topics[cluster] for cluster in clusters],
+            [self.types[cluster] for cluster in clusters]
+        ))
+        self.written = end
+
+
+class OutputSink:
+    FORMATS = {
+        'csv': (CSVOpinionsWriter, 'csv'),
+        'parquet': (ParquetOpinionsWriter, 'parquet'),
+        'arrow': (ArrowOpinionsWriter, 'arrows'),
+    }
+
+    def __init__(self, save_dir='outputs', output_format='csv'):
+        """
+        Opinions and conclusions files of one run, named opinions_<timestamp> and
+        conclusions_<timestamp> in save_dir. Opinions are appended as batches finish.
+
+        Parameters:
+        - save_dir: Output directory, created if missing.
+        - output_format: 'csv', 'parquet' or 'arrow' (Arrow IPC stream).
+        """
+        if output_format not in self.FORMATS:
+            raise ValueError(f"Unknown output format: {output_format}. Expected one of {tuple(self.FORMATS)}.")
+
+        if save_dir and not os.path.exists(save_dir):
+            os.makedirs(save_dir, exist_ok=True)
+
+        self.save_dir = save_dir
+        self.writer_class, self.extension = self.FORMATS[output_format]
+        self.timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        self._opinions = None
+
+    def path(self, prefix):
+        return os.path.join(self.save_dir, f'{prefix}_{self.timestamp}.{self.extension}')
+
+    @property
+    def rows_written(self):
+        return self._opinions.rows_written if self._opinions is not None else 0
+
+    def write_opinions(self, comments):
+        if self._opinions is None:
+            path = self.path('opinions')
+            logging.info(f"Opinions saving to {path}...")
+            self._opinions = self.writer_class(path)
+        with timed_stage('write_opinions', len(comments)):
+            self._opinions.write_batch(comments)
+
+    def write_conclusions(self, conclusions):
+        path = self.path('conclusions')
+        logging.info(f"Conclusions saving to {path}...")
+        with timed_stage('write_conclusions', len(conclusions)):
+            self.writer_class.write_conclusions(path, conclusions)
+        logging.info(f"Conclusions successfully saved to {path}.")
+
+    def write_report(self):
+        """
+        Saves the per-stage timings, throughput, batch sizes and peak memory recorded so far
+        as run_report_<timestamp>.json next to the outputs.
+        """
+        write_run_report(os.path.join(self.save_dir, f'run_report_{self.timestamp}.json'))
+
+    def close(self):
+        if self._opinions is not None:
+            self._opinions.close()
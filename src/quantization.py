@@ -0,0 +1,70 @@
+# quantization.py
+
+import hashlib
+import importlib
+import logging
+import os
+
+from compute_backend import get_backend
+
+QUANTIZE_ENV_VAR = 'OPINION_ANALYZER_QUANTIZE'
+MODELS = ('embedding', 'classifier', 'summarizer')
+
+
+def quantized_models(value=None):
+    """
+    Returns the set of models to run quantized. value is an iterable of names from MODELS,
+    True for all of them, or None to read a comma-separated list (or 'all') from
+    OPINION_ANALYZER_QUANTIZE. Quantization only applies to the CPU backend.
+    """
+    if value is None:
+        value = os.environ.get(QUANTIZE_ENV_VAR, '')
+    if value is True or value == 'all':
+        value = MODELS
+    if isinstance(value, str):
+        value = [name.strip() for name in value.split(',') if name.strip()]
+
+    names = set(value or ())
+    unknown = names - set(MODELS)
+    if unknown:
+        raise ValueError(f"Unknown quantized models: {sorted(unknown)}. Expected names from {MODELS}.")
+
+    if names and get_backend().is_gpu:
+        logging.warning("Int8 dynamic quantization only runs on CPU; using fp32 models on the GPU.")
+        return set()
+    return names
+
+
+def load_quantized(name, load_model, cache_dir='cache/quantized'):
+    """
+    Returns an int8 dynamically quantized torch module: the weights of its Linear layers are
+    stored as int8 and activations are quantized on the fly. The converted module is saved to
+    cache_dir, so later runs load it directly without loading the fp32 weights first.
+
+    Parameters:
+    - name: Model name, used with the torch version to name the cached artifact.
+    - load_model: Callable returning the fp32 torch.nn.Module on the CPU.
+    - cache_dir: Directory of the cached quantized modules.
+    """
+    torch = importlib.import_module('torch')
+
+    digest = hashlib.sha256(f'{name}|{torch.__version__}|qint8'.encode('utf-8')).hexdigest()[:16]
+    path = os.path.join(cache_dir, f"{name.replace('/', '--')}-{digest}.pt")
+
+    if os.path.exists(path):
+        try:
+            logging.info(f"Loading quantized {name} from {path}...")
+            return torch.load(path, map_location='cpu', weights_only=False)
+        except Exception as e:
+            logging.warning(f"Could not load quantized {name} from {path}, converting again: {e}")
+
+    logging.info(f"Quantizing {name} to int8...")
+    model = torch.quantization.quantize_dynamic(load_model().eval(), {torch.nn.Linear}, dtype=torch.qint8)
+
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    torch.save(model, tmp_path)
+    os.replace(tmp_path, path)
+    logging.info(f"Quantized {name} saved to {path}.")
+
+    return model
@@ -0,0 +1,190 @@
+# quantization_report.py
+
+import argparse
+import json
+import logging
+import os
+import random
+import time
+
+import numpy as np
+
+from comment_classifier import CommentClassifier
+from compute_backend import configure_backend, get_backend
+from conclusion_generator import ConclusionGenerator
+from quantization import MODELS
+from text_preprocessor import TextPreprocessor
+from topic_similarity_calculator import TopicSimilarityCalculator
+
+THRESHOLDS = {
+    'embedding': ('topic_agreement', 0.98),
+    'classifier': ('label_agreement', 0.95),
+    'summarizer': ('mean_rouge_l', 0.80),
+}
+
+
+def rouge_l(reference, candidate):
+    """
+    ROUGE-L F1 between two texts: the longest common subsequence of their words, relative to
+    both lengths.
+    """
+    a, b = reference.split(), candidate.split()
+    if not a or not b:
+        return float(a == b)
+
+    previous = [0] * (len(b) + 1)
+    for word in a:
+        current = [0]
+        for j, other in enumerate(b):
+            current.append(previous[j] + 1 if word == other else max(previous[j + 1], current[j]))
+        previous = current
+
+    lcs = previous[-1]
+    if not lcs:
+        return 0.0
+    precision, recall = lcs / len(b), lcs / len(a)
+    return 2 * precision * recall / (precision + recall)
+
+
+def _timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def _compare_embedding(topics, opinions):
+    backend = get_backend()
+    results = {}
+    for name, quantize in (('fp32', False), ('int8', True)):
+        calculator = TopicSimilarityCalculator(quantize=quantize)
+        calculator.load()  # Keep model loading out of the timings.
+
+        def run():
+            embeddings = calculator.encode_comments(opinions)
+            return embeddings, calculator.get_topics_by_similarity_batch(opinions, topics, comment_embeddings=embeddings)
+
+        results[name] = _timed(run)
+
+    (fp32_embeddings, fp32_topics), fp32_seconds = results['fp32']
+    (int8_embeddings, int8_topics), int8_seconds = results['int8']
+    cosine = (np.asarray(backend.asnumpy(fp32_embeddings)) * np.asarray(backend.asnumpy(int8_embeddings))).sum(axis=1)
+
+    return {
+        'topic_agreement': float(np.mean([a == b for a, b in zip(fp32_topics, int8_topics)])),
+        'mean_embedding_cosine': float(cosine.mean()),
+        'min_embedding_cosine': float(cosine.min()),
+    }, fp32_seconds, int8_seconds
+
+
+def _compare_classifier(opinions):
+    results = {}
+    for name, quantize in (('fp32', False), ('int8', True)):
+        classifier = CommentClassifier(quantize=quantize)
+        classifier.load()
+        results[name] = _timed(lambda: classifier.classify_comments_batch(opinions))
+
+    (fp32_labels, fp32_seconds), (int8_labels, int8_seconds) = results['fp32'], results['int8']
+    per_label = {}
+    for label in CommentClassifier.LABELS:
+        indices = [i for i, fp32_label in enumerate(fp32_labels) if fp32_label == label]
+        if indices:
+            per_label[label] = float(np.mean([int8_labels[i] == label for i in indices]))
+
+    return {
+        'label_agreement': float(np.mean([a == b for a, b in zip(fp32_labels, int8_labels)])),
+        'per_label_agreement': per_label,
+    }, fp32_seconds, int8_seconds
+
+
+def _compare_summarizer(opinions, batch_size):
+    results = {}
+    for name, quantize in (('fp32', False), ('int8', True)):
+        generator = ConclusionGenerator(quantize=quantize)
+        generator.load()
+        results[name] = _timed(lambda: generator.summarize_texts(opinions, batch_size))
+
+    (fp32_summaries, fp32_seconds), (int8_summaries, int8_seconds) = results['fp32'], results['int8']
+    scores = [rouge_l(a, b) for a, b in zip(fp32_summaries, int8_summaries)]
+
+    return {
+        'mean_rouge_l': float(np.mean(scores)),
+        'min_rouge_l': float(np.min(scores)),
+        'exact_match': float(np.mean([a == b for a, b in zip(fp32_summaries, int8_summaries)])),
+    }, fp32_seconds, int8_seconds
+
+
+def quantization_report(topics, opinions, models=MODELS, sample_size=512, summary_sample_size=32,
+                        summary_batch_size=8, seed=0):
+    """
+    Runs each model in fp32 and int8 on the same reference sample and reports how closely the
+    quantized outputs match, the speedup, and whether the match clears THRESHOLDS.
+
+    Parameters:
+    - topics, opinions: Raw reference texts; they are preprocessed like in an analysis.
+    - models: Models to compare, names from quantization.MODELS.
+    - sample_size: Opinions used for topic assignments and labels.
+    - summary_sample_size: Opinions summarized, a prefix of the sample.
+    - summary_batch_size: Summarization batch size.
+    - seed: Seed of the opinion sample.
+    """
+    unknown = set(models) - set(MODELS)
+    if unknown:
+        raise ValueError(f"Unknown models: {sorted(unknown)}. Expected names from {MODELS}.")
+
+    preprocessor = TextPreprocessor()
+    topics = [text for text in preprocessor.preprocess_batch(topics, processes=1) if text]
+    opinions = [text for text in preprocessor.preprocess_batch(opinions, processes=1) if text]
+    sample = random.Random(seed).sample(opinions, min(sample_size, len(opinions)))
+
+    report = {'sample_size': len(sample), 'models': {}}
+    for model in models:
+        logging.info(f"Comparing fp32 and int8 {model}...")
+        if model == 'embedding':
+            metrics, fp32_seconds, int8_seconds = _compare_embedding(topics, sample)
+        elif model == 'classifier':
+            metrics, fp32_seconds, int8_seconds = _compare_classifier(sample)
+        else:
+            metrics, fp32_seconds, int8_seconds = _compare_summarizer(sample[:summary_sample_size], summary_batch_size)
+
+        metric, threshold = THRESHOLDS[model]
+        report['models'][model] = dict(
+            metrics,
+            fp32_seconds=fp32_seconds,
+            int8_seconds=int8_seconds,
+            speedup=fp32_seconds / int8_seconds if int8_seconds else None,
+            threshold={metric: threshold},
+            acceptable=metrics[metric] >= threshold
+        )
+
+    return report
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description="Compare int8 quantized models against the fp32 baseline.")
+    parser.add_argument('topics', help="CSV file with a 'text' column of topics.")
+    parser.add_argument('opinions', help="CSV file with a 'text' column of opinions.")
+    parser.add_argument('--models', default=','.join(MODELS), help="Comma-separated subset of %(default)s.")
+    parser.add_argument('--sample-size', type=int, default=512)
+    parser.add_argument('--summary-sample-size', type=int, default=32)
+    parser.add_argument('--output', default='outputs/quantization_report.json')
+    args = parser.parse_args()
+
+    backend = configure_backend('cpu')
+    topics = backend.column_to_list(backend.read_csv(args.topics), 'text')
+    opinions = backend.column_to_list(backend.read_csv(args.opinions), 'text')
+
+    report = quantization_report(
+        topics, opinions,
+        models=[name.strip() for name in args.models.split(',') if name.strip()],
+        sample_size=args.sample_size,
+        summary_sample_size=args.summary_sample_size
+    )
+
+    output_dir = os.path.dirname(args.output)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    with open(args.output, 'w', encoding='utf-8') as file:
+        json.dump(report, file, indent=2)
+    logging.info(f"Quantization report saved to {args.output}.")
@@ -0,0 +1,174 @@
+# request_scheduler.py
+
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+
+class AnalysisRequest:
+    def __init__(self, topics=(), opinions=(), with_conclusions=True, call=None):
+        self.topics = list(topics)
+        self.opinions = list(opinions)
+        self.with_conclusions = with_conclusions
+        self.call = call
+        self.future = Future()
+
+
+class MicroBatchScheduler:
+    def __init__(self, analyzer, max_batch_size=1024, max_wait_ms=20):
+        """
+        Merges concurrent analysis requests into shared model batches.
+
+        Requests are queued and a single worker thread drains them: it waits at most
+        max_wait_ms after the first queued request for more to arrive, stops collecting once
+        max_batch_size opinions are gathered, runs them through the analyzer together and
+        resolves each caller's future with its own results. The worker is the only thread
+        that touches the models, so requests never share mutable analyzer state.
+
+        Each request is validated before it joins a batch, and a rejected one fails alone with
+        a ValueError. If a merged batch still fails, its requests are rerun one by one so only
+        the failing ones get the error.
+
+        Parameters:
+        - analyzer: The OpinionAnalyzer whose models serve every request.
+        - max_batch_size: Number of opinions after which a batch is dispatched immediately.
+        - max_wait_ms: Longest time the first request of a batch waits for others.
+        """
+        self.analyzer = analyzer
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue = queue.Queue()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name='micro-batch-scheduler', daemon=True)
+        self._thread.start()
+        logging.info(
+            f"Micro-batch scheduler started (max batch {self.max_batch_size} opinions, "
+            f"max wait {self.max_wait * 1000:.0f} ms)."
+        )
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stopped.set()
+        self._thread.join()
+        self._thread = None
+
+        while True:
+            try:
+                request = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            request.future.set_exception(RuntimeError("Scheduler stopped before the request was served."))
+
+        logging.info("Micro-batch scheduler stopped.")
+
+    def submit(self, topics, opinions, with_conclusions=True):
+        return self._enqueue(AnalysisRequest(topics, opinions, with_conclusions))
+
+    def call(self, fn):
+        """
+        Runs fn(analyzer) on the scheduler thread, between batches, and returns its result.
+        """
+        return self.submit_call(fn).result()
+
+    def submit_call(self, fn):
+        """
+        Queues fn(analyzer) like call and returns a Future instead of waiting for it.
+        """
+        return self._enqueue(AnalysisRequest(call=fn))
+
+    def _enqueue(self, request):
+        if self._thread is None:
+            raise RuntimeError("Scheduler is not running.")
+        self._queue.put(request)
+        return request.future
+
+    def _run(self):
+        while not self._stopped.is_set():
+            try:
+                first = self._queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+
+            if first.call is not None:
+                self._process_call(first)
+                continue
+
+            batch = [first]
+            size = len(first.opinions)
+            deadline = time.monotonic() + self.max_wait
+            pending_call = None
+
+            while size < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    request = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if request.call is not None:
+                    pending_call = request
+                    break
+                batch.append(request)
+                size += len(request.opinions)
+
+            self._process(batch)
+            if pending_call is not None:
+                self._process_call(pending_call)
+
+    def _process(self, batch):
+        # Requests that cannot be analyzed are rejected alone instead of failing the merged batch.
+        valid = []
+        for request in batch:
+            try:
+                self.analyzer.validate_request(request.topics, request.opinions)
+            except ValueError as e:
+                request.future.set_exception(e)
+            else:
+                valid.append(request)
+        if not valid:
+            return
+
+        logging.info(f"Dispatching {len(valid)} request(s) with {sum(len(r.opinions) for r in valid)} opinions...")
+        try:
+            results = self._analyze(valid)
+        except Exception as e:
+            if len(valid) == 1:
+                logging.error(f"Analysis failed: {e}")
+                valid[0].future.set_exception(e)
+                return
+            logging.warning(f"Batched analysis of {len(valid)} requests failed: {e}; retrying them one by one.")
+            for request in valid:
+                self._process_one(request)
+            return
+
+        for request, result in zip(valid, results):
+            request.future.set_result(result)
+
+    def _process_one(self, request):
+        try:
+            request.future.set_result(self._analyze([request])[0])
+        except Exception as e:
+            logging.error(f"Analysis failed: {e}")
+            request.future.set_exception(e)
+
+    def _analyze(self, batch):
+        return self.analyzer.analyze_grpc_batch(
+            [(r.topics, r.opinions) for r in batch],
+            with_conclusions=[r.with_conclusions for r in batch]
+        )
+
+    def _process_call(self, request):
+        try:
+            request.future.set_result(request.call(self.analyzer))
+        except Exception as e:
+            request.future.set_exception(e)
@@ -0,0 +1,205 @@
+# result_cache.py
+
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+class ResultCache:
+    FIELDS = ('embedding', 'label', 'summary')
+
+    def __init__(self, max_entries=50000, disk_path=None, max_disk_bytes=1 << 30):
+        """
+        Content-addressed cache of per-text model outputs (embeddings, labels, summaries).
+        Keys hash the preprocessed text together with a configuration string naming the
+        model and its settings, so changing either never returns a stale result.
+
+        Parameters:
+        - max_entries: Entries kept in the in-process LRU tier.
+        - disk_path: Optional SQLite file used as a second, persistent tier.
+        - max_disk_bytes: Size bound of the stored values on disk; least recently used
+          entries are evicted beyond it.
+        """
+        self.max_entries = max_entries
+        self.max_disk_bytes = max_disk_bytes
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._counts = {field: {'hits': 0, 'misses': 0} for field in self.FIELDS}
+
+        self._db = None
+        self._disk_bytes = 0
+        if disk_path:
+            directory = os.path.dirname(disk_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(disk_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                "key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL, accessed REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed)")
+            self._disk_bytes = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+            logging.info(f"Result cache opened at {disk_path} ({self._disk_bytes} bytes).")
+
+    @staticmethod
+    def make_key(field, config, text):
+        digest = hashlib.sha256(f'{field}\0{config}\0'.encode('utf-8'))
+        digest.update(text.encode('utf-8'))
+        return digest.hexdigest()
+
+    def get_or_compute(self, field, texts, config, compute):
+        """
+        Returns one value per text. Texts without a cached value are deduplicated and passed
+        to compute as a list of indices into texts; compute returns their values in order.
+        """
+        keys = [self.make_key(field, config, text) for text in texts]
+        values = self._get_many(field, keys)
+
+        missing = {}
+        for i, (key, value) in enumerate(zip(keys, values)):
+            if value is None and key not in missing:
+                missing[key] = i
+
+        if missing:
+            computed = compute(list(missing.values()))
+            if len(computed) != len(missing):
+                raise ValueError(f"Expected {len(missing)} computed {field} values, got {len(computed)}.")
+            computed_by_key = dict(zip(missing, computed))
+            self._put_many(field, computed_by_key)
+            values = [
+                computed_by_key[key] if value is None else value
+                for key, value in zip(keys, values)
+            ]
+
+        return values
+
+    def stats(self):
+        with self._lock:
+            result = {}
+            for field, counts in self._counts.items():
+                total = counts['hits'] + counts['misses']
+                result[field] = dict(counts, hit_rate=counts['hits'] / total if total else 0.0)
+            return result
+
+    def log_stats(self):
+        for field, counts in self.stats().items():
+            if counts['hits'] or counts['misses']:
+                logging.info(
+                    f"Result cache {field}: {counts['hits']} hits, {counts['misses']} misses "
+                    f"({counts['hit_rate']:.2%} hit rate)."
+                )
+
+    def _get_many(self, field, keys):
+        values = []
+        disk_keys = []
+
+        with self._lock:
+            for key in keys:
+                value = self._memory.get(key)
+                if value is not None:
+                    self._memory.move_to_end(key)
+                else:
+                    disk_keys.append(key)
+                values.append(value)
+
+            found = self._disk_get(set(disk_keys)) if disk_keys and self._db is not None else {}
+            decoded = {key: self._decode(field, blob) for key, blob in found.items()}
+            for key, value in decoded.items():
+                self._remember(key, value)
+
+            values = [decoded.get(key) if value is None else value for key, value in zip(keys, values)]
+            hits = sum(value is not None for value in values)
+            self._counts[field]['hits'] += hits
+            self._counts[field]['misses'] += len(values) - hits
+
+        return values
+
+    def _put_many(self, field, values_by_key):
+        with self._lock:
+            for key, value in values_by_key.items():
+                self._remember(key, value)
+
+            if self._db is not None:
+                now = time.time()
+                rows = []
+                for key, value in values_by_key.items():
+                    blob = self._encode(field, value)
+                    rows.append((key, blob, len(blob), now))
+                    self._disk_bytes += len(blob)
+                with self._db:
+                    self._db.executemany("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)", rows)
+                self._evict_disk()
+
+    def _remember(self, key, value):
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _disk_get(self, keys):
+        keys = list(keys)
+        found = {}
+        now = time.time()
+        for i in range(0, len(keys), 500):
+            part = keys[i:i + 500]
+            placeholders = ','.join('?' * len(part))
+            rows = self._db.execute(
+                f"SELECT key, value FROM results WHERE key IN ({placeholders})", part
+            ).fetchall()
+            found.update(rows)
+            if rows:
+                with self._db:
+                    self._db.executemany(
+                        "UPDATE results SET accessed = ? WHERE key = ?", [(now, key) for key, _ in rows]
+                    )
+        return found
+
+    def _evict_disk(self):
+        if self._disk_bytes <= self.max_disk_bytes:
+            return
+
+        # Resync with what is actually stored, since replaced rows were counted twice.
+        self._disk_bytes = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+        if self._disk_bytes <= self.max_disk_bytes:
+            return
+
+        evicted = 0
+        with self._db:
+            for key, size in self._db.execute("SELECT key, size FROM results ORDER BY accessed").fetchall():
+                if self._disk_bytes <= self.max_disk_bytes:
+                    break
+                self._db.execute("DELETE FROM results WHERE key = ?", (key,))
+                self._disk_bytes -= size
+                evicted += 1
+        logging.info(f"Result cache evicted {evicted} entries from disk.")
+
+    @staticmethod
+    def _encode(field, value):
+        if field == 'embedding':
+            return np.asarray(value, dtype=np.float32).tobytes()
+        return value.encode('utf-8')
+
+    @staticmethod
+    def _decode(field, blob):
+        if field == 'embedding':
+            return np.frombuffer(blob, dtype=np.float32)
+        return blob.decode('utf-8')
+
+    def after_fork(self):
+        """
+        Called in a forked child: drops the SQLite connection inherited from the parent, which
+        must not be used across processes, and keeps only the in-memory tier.
+        """
+        self._db = None
+        self._lock = threading.Lock()
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
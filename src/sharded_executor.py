@@ -0,0 +1,108 @@
+# sharded_executor.py
+
+import importlib
+import logging
+import multiprocessing
+import os
+
+from compute_backend import get_backend
+
+_analyzer = None
+
+
+def _init_worker(threads):
+    try:
+        importlib.import_module('torch').set_num_threads(threads)
+    except ImportError:
+        pass
+
+    if _analyzer.result_cache is not None:
+        _analyzer.result_cache.after_fork()
+    # Each worker would refit its own copy of the centroids from whichever shards it happens to
+    # get, so they stay as forked and the labels do not depend on scheduling.
+    _analyzer.comment_classifier.learning = False
+
+
+def _classify_shard(args):
+    topics, opinions, batch_size = args
+    return _analyzer.classify_segments([(topics, opinions)], batch_size, collapse=False)[0]
+
+
+def _summarize_shard(args):
+    texts, batch_size = args
+    return _analyzer.conclusion_generator.summarize_texts(texts, batch_size)
+
+
+class ShardedExecutor:
+    def __init__(self, analyzer, workers=None, threads_per_worker=None, shards_per_worker=4):
+        """
+        Pool of forked worker processes that share the models of analyzer copy-on-write and
+        process shards of a corpus in parallel. CPU backend only.
+
+        The models are loaded here, before forking, and the parent runs no inference until the
+        pool exists, so no intra-op thread pool is inherited half-initialized.
+
+        Parameters:
+        - analyzer: OpinionAnalyzer whose models the workers use.
+        - workers: Worker processes; defaults to the CPU count divided by threads_per_worker.
+        - threads_per_worker: Intra-op threads of each worker; defaults to the backend's thread
+          count divided by workers, at least 1, so workers do not oversubscribe the cores.
+        - shards_per_worker: Shards per worker, so faster workers pick up more of the work.
+        """
+        global _analyzer
+
+        backend = get_backend()
+        if backend.is_gpu:
+            raise ValueError("Sharded execution runs on the CPU backend only.")
+
+        cores = backend.num_threads or os.cpu_count() or 1
+        if workers is None:
+            workers = max(1, cores // (threads_per_worker or 1))
+        if threads_per_worker is None:
+            threads_per_worker = max(1, cores // workers)
+
+        self.workers = workers
+        self.threads_per_worker = threads_per_worker
+        self.shards_per_worker = shards_per_worker
+
+        analyzer.similarity_calculator.load()
+        analyzer.comment_classifier.load()
+        analyzer.conclusion_generator.load()
+
+        _analyzer = analyzer
+        context = multiprocessing.get_context('fork')
+        self._pool = context.Pool(workers, initializer=_init_worker, initargs=(threads_per_worker,))
+        logging.info(f"Started {workers} sharded workers with {threads_per_worker} thread(s) each.")
+
+    def _shards(self, items):
+        shard_size = max(1, -(-len(items) // (self.workers * self.shards_per_worker)))
+        return [items[i:i + shard_size] for i in range(0, len(items), shard_size)]
+
+    def classify_shards(self, topics, opinions, batch_size=8192):
+        """
+        Classifies opinions against topics in shards and yields one ClassifiedComments per shard
+        in input order as soon as it and the shards before it are done.
+        """
+        shards = self._shards(opinions)
+        logging.info(f"Classifying {len(opinions)} opinions in {len(shards)} shards...")
+        yield from self._pool.imap(_classify_shard, [(topics, shard, batch_size) for shard in shards], chunksize=1)
+
+    def summarize_texts(self, texts, batch_size=64):
+        """
+        Drop-in replacement for ConclusionGenerator.summarize_texts that summarizes in shards.
+        """
+        shards = self._shards(texts)
+        logging.info(f"Summarizing {len(texts)} texts in {len(shards)} shards...")
+        summaries = []
+        for part in self._pool.map(_summarize_shard, [(shard, batch_size) for shard in shards], chunksize=1):
+            summaries.extend(part)
+        return summaries
+
+    def close(self):
+        global _analyzer
+
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+            _analyzer = None
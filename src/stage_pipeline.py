@@ -0,0 +1,100 @@
+# stage_pipeline.py
+
+import logging
+import queue
+import threading
+
+_END = object()
+
+
+class _Failure:
+    def __init__(self, error):
+        self.error = error
+
+
+class StagePipeline:
+    def __init__(self, source, stages, queue_depth=2):
+        """
+        Runs a chain of stages on separate threads connected by bounded queues, so different
+        items are processed by different stages at the same time.
+
+        Parameters:
+        - source: Iterable producing the input items; it is consumed on its own thread.
+        - stages: List of (name, fn) pairs; each fn maps one item to the next stage's item.
+        - queue_depth: Capacity of each queue. At most this many items wait between two
+          stages, which bounds memory regardless of the input size.
+        """
+        self.source = source
+        self.stages = stages
+        self.queue_depth = queue_depth
+
+    def run(self):
+        """
+        Yields the outputs of the last stage in input order. An exception raised by the source
+        or any stage stops the pipeline and is re-raised here.
+        """
+        queues = [queue.Queue(maxsize=self.queue_depth) for _ in range(len(self.stages) + 1)]
+        stop = threading.Event()
+
+        def put(q, item):
+            while not stop.is_set():
+                try:
+                    q.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def get(q):
+            while not stop.is_set():
+                try:
+                    return q.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+            return _END
+
+        def produce():
+            try:
+                for item in self.source:
+                    if not put(queues[0], item):
+                        return
+                put(queues[0], _END)
+            except Exception as e:
+                put(queues[0], _Failure(e))
+
+        def work(name, fn, inbox, outbox):
+            while True:
+                item = get(inbox)
+                if item is _END or isinstance(item, _Failure):
+                    put(outbox, item)
+                    return
+                try:
+                    result = fn(item)
+                except Exception as e:
+                    logging.error(f"Pipeline stage '{name}' failed: {e}")
+                    put(outbox, _Failure(e))
+                    return
+                if not put(outbox, result):
+                    return
+
+        threads = [threading.Thread(target=produce, name='pipeline-source', daemon=True)]
+        for i, (name, fn) in enumerate(self.stages):
+            threads.append(threading.Thread(
+                target=work, args=(name, fn, queues[i], queues[i + 1]), name=f'pipeline-{name}', daemon=True
+            ))
+
+        for thread in threads:
+            thread.start()
+
+        try:
+            while True:
+                item = get(queues[-1])
+                if item is _END:
+                    break
+                if isinstance(item, _Failure):
+                    raise item.error
+                yield item
+        finally:
+            stop.set()
+            for thread in threads:
+                thread.join()
@@ -0,0 +1,84 @@
+# streaming_session.py
+
+import logging
+from collections import deque
+
+from classified_comments import ClassifiedComments
+from topic_accumulator import TopicAccumulator
+
+
+class StreamingSession:
+    def __init__(self, scheduler, batch_size=256, max_in_flight=2, max_comments_per_topic=256):
+        """
+        Analyzes an incoming stream of opinion chunks and yields results as batches complete.
+
+        Topics are taken from the chunks received before the first opinion. Opinions are
+        regrouped into batches of batch_size and submitted to the scheduler without summaries;
+        at most max_in_flight batches are pending at once, so the input is only read as fast
+        as results are consumed. Per-topic type counts are kept exactly, while summaries are
+        generated at the end from a bounded sample of each topic's comments.
+
+        Parameters:
+        - scheduler: Running MicroBatchScheduler that owns the models.
+        - batch_size: Opinions per submitted batch.
+        - max_in_flight: Batches submitted but not yet yielded back.
+        - max_comments_per_topic: Comments per topic kept for the final summaries.
+        """
+        self.scheduler = scheduler
+        self.batch_size = batch_size
+        self.max_in_flight = max_in_flight
+        self.accumulator = TopicAccumulator(max_comments_per_topic)
+
+    def run(self, chunks):
+        """
+        chunks yields (topics, opinions) pairs. Yields ('opinions', [(text, topic, type)]) per
+        completed batch, then a single ('topics', [(topic, summary, effectiveness)]).
+        """
+        in_flight = deque()
+
+        for topics, batch in self._batches(chunks):
+            in_flight.append(self.scheduler.submit(topics, batch, with_conclusions=False))
+            while len(in_flight) >= self.max_in_flight:
+                yield 'opinions', self._collect(in_flight.popleft())
+
+        while in_flight:
+            yield 'opinions', self._collect(in_flight.popleft())
+
+        conclusions = self.scheduler.call(
+            lambda analyzer: self.accumulator.conclusions(analyzer.conclusion_generator)
+        )
+        yield 'topics', [
+            (topic, summary, effectiveness)
+            for topic, effectiveness, summary_list in conclusions
+            for summary in summary_list
+        ]
+
+    def _batches(self, chunks):
+        topics = []
+        pending = []
+        started = False
+
+        for chunk_topics, chunk_opinions in chunks:
+            if chunk_topics:
+                if started:
+                    logging.warning("Ignoring topics received after the first opinions.")
+                else:
+                    topics.extend(chunk_topics)
+
+            if chunk_opinions:
+                if not topics:
+                    raise ValueError("Topics must be sent before the first opinions.")
+                started = True
+                pending.extend(chunk_opinions)
+
+            while len(pending) >= self.batch_size:
+                yield topics, pending[:self.batch_size]
+                pending = pending[self.batch_size:]
+
+        if pending:
+            yield topics, pending
+
+    def _collect(self, future):
+        opinions_result, _ = future.result()
+        self.accumulator.add(ClassifiedComments.from_rows(opinions_result))
+        return opinions_result
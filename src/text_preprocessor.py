@@ -1,55 +1,139 @@
 # text_preprocessor.py
 
 import logging
+import multiprocessing
+import os
 import re
 import unicodedata
 
 import emoji
-import nltk
-from nltk.corpus import stopwords
 
+_DIGITS = re.compile(r'\d+')
+_URLS = re.compile(r'http\S+|www\S+|https\S+')
+_EMAILS = re.compile(r'\S+@\S+')
+_WHITESPACE = re.compile(r'\s+')
 
-class TextPreprocessor:
-    def __init__(self):
-        nltk.download('stopwords', quiet=True)
-        self.stop_words = set(stopwords.words('english'))
+_BUNDLED_STOPWORDS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'resources', 'stopwords_english.txt')
 
-    def preprocess_text(self, text, max_length=1024):
-        try:
-            if not text or not isinstance(text, str) or text.isspace():
-                logging.debug(f"Ignoring invalid text: {text}")
-                return None
-
-            text = text.lower()
-            text = re.sub(r'\d+', '', text)
-            text = re.sub(r'http\S+|www\S+|https\S+', '', text)
-            text = re.sub(r'\S+@\S+', '', text)
+_worker_stop_words = None
+
+
+def load_stop_words():
+    """
+    Returns the English stopwords bundled with the source: the 198-word list that
+    nltk.download('stopwords') currently provides, so preprocessing matches the original
+    NLTK-based version on every machine without a download.
+    """
+    with open(_BUNDLED_STOPWORDS, encoding='utf-8') as file:
+        return frozenset(line.strip() for line in file if line.strip())
+
+
+def _preprocess_text(text, stop_words, max_length):
+    try:
+        if not text or not isinstance(text, str) or text.isspace():
+            logging.debug(f"Ignoring invalid text: {text}")
+            return None
+
+        text = text.lower()
+        text = _DIGITS.sub('', text)
+        text = _URLS.sub('', text)
+        text = _EMAILS.sub('', text)
+
+        # Emoji and combining marks are never ASCII, so pure ASCII text skips both scans.
+        if text.isascii():
+            text = _WHITESPACE.sub(' ', text).strip()
+        else:
             text = emoji.replace_emoji(text, replace='')
-            text = re.sub(r'\s+', ' ', text).strip()
-            text = ''.join(
+            text = _WHITESPACE.sub(' ', text).strip()
+            text = ''.join([
                 c for c in unicodedata.normalize('NFKD', text)
                 if not unicodedata.combining(c)
-            )
-            words = text.split()
-            filtered_words = [word for word in words if word not in self.stop_words]
+            ])
 
-            if not filtered_words:
-                logging.debug(f"Text became empty after filtering: {text}")
-                return None
+        words = text.split()
+        filtered_words = [word for word in words if word not in stop_words]
 
-            processed_text = ' '.join(filtered_words)
-
-            if len(processed_text) > max_length:
-                logging.debug(f"Processed text exceeds {max_length} characters. It will be truncated.")
-                processed_text = processed_text[:max_length].rsplit(' ', 1)[0]
+        if not filtered_words:
+            logging.debug(f"Text became empty after filtering: {text}")
+            return None
 
-            processed_text = processed_text.strip()
+        processed_text = ' '.join(filtered_words)
 
-            if len(processed_text) < 2:
-                return None
+        if len(processed_text) > max_length:
+            logging.debug(f"Processed text exceeds {max_length} characters. It will be truncated.")
+            processed_text = processed_text[:max_length].rsplit(' ', 1)[0]
 
-            return processed_text
+        processed_text = processed_text.strip()
 
-        except Exception as e:
-            logging.error(f"Error processing text: {e}")
+        if len(processed_text) < 2:
             return None
+
+        return processed_text
+
+    except Exception as e:
+        logging.error(f"Error processing text: {e}")
+        return None
+
+
+def _init_worker(stop_words):
+    global _worker_stop_words
+    _worker_stop_words = stop_words
+
+
+def _preprocess_chunk(args):
+    texts, max_length = args
+    return [_preprocess_text(text, _worker_stop_words, max_length) for text in texts]
+
+
+class TextPreprocessor:
+    def __init__(self):
+        self.stop_words = load_stop_words()
+        self._pool = None
+        self._pool_size = 0
+
+    def preprocess_text(self, text, max_length=1024):
+        return _preprocess_text(text, self.stop_words, max_length)
+
+    def preprocess_batch(self, texts, max_length=1024, processes=None, chunk_size=2048):
+        """
+        Preprocesses a list of texts, returning a list of the same length with exactly what
+        preprocess_text returns for each (None for texts that are dropped).
+
+        Parameters:
+        - texts: Sequence of texts.
+        - max_length: Same as preprocess_text.
+        - processes: Worker processes; defaults to the CPU count. 1 runs in this process.
+        - chunk_size: Texts per unit of work sent to a worker.
+        """
+        texts = list(texts)
+        processes = processes or os.cpu_count() or 1
+
+        if processes <= 1 or len(texts) < 2 * chunk_size:
+            return [_preprocess_text(text, self.stop_words, max_length) for text in texts]
+
+        chunks = [(texts[i:i + chunk_size], max_length) for i in range(0, len(texts), chunk_size)]
+
+        results = []
+        for chunk_result in self._get_pool(processes).imap(_preprocess_chunk, chunks):
+            results.extend(chunk_result)
+        return results
+
+    def _get_pool(self, processes):
+        if self._pool is None or self._pool_size != processes:
+            self.close()
+            # Forked workers start without re-importing main.py and its model stack. They only run
+            # the regex and emoji cleanup, never touching CUDA or the model threads they inherit.
+            # Spawn remains the fallback where fork is not available (Windows).
+            method = 'fork' if 'fork' in multiprocessing.get_all_start_methods() else 'spawn'
+            context = multiprocessing.get_context(method)
+            self._pool = context.Pool(processes, initializer=_init_worker, initargs=(self.stop_words,))
+            self._pool_size = processes
+            logging.info(f"Started {processes} text preprocessing workers.")
+        return self._pool
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+            self._pool_size = 0
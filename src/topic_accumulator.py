@@ -0,0 +1,57 @@
+# topic_accumulator.py
+
+import random
+from collections import Counter, defaultdict
+
+import numpy as np
+
+from metrics import timed_stage
+from topic_effectiveness_classifier import TopicEffectivenessClassifier
+
+
+class TopicAccumulator:
+    def __init__(self, max_comments_per_topic=256, seed=0):
+        """
+        Running per-topic state for analyses that never hold every opinion in memory.
+        Type counts are exact; the comments kept for summarization are a uniform reservoir
+        sample of at most max_comments_per_topic comment texts per topic, or every comment text
+        when max_comments_per_topic is None.
+        """
+        self.max_comments_per_topic = max_comments_per_topic
+        self.type_counts = defaultdict(Counter)
+        self.samples = defaultdict(list)
+        self.seen = Counter()
+        self._random = random.Random(seed)
+
+    def add(self, comments):
+        """
+        Adds a ClassifiedComments batch. Comments that stand for a collapsed cluster count once
+        per member.
+        """
+        matrix = comments.type_count_matrix()
+        for code, topic, indices in comments.topic_groups():
+            counts = self.type_counts[topic]
+            for type_code in np.flatnonzero(matrix[code]):
+                counts[comments.types[type_code]] += int(matrix[code, type_code])
+
+            sample = self.samples[topic]
+            for i in indices:
+                self.seen[topic] += int(comments.counts[i])
+                if self.max_comments_per_topic is None or len(sample) < self.max_comments_per_topic:
+                    sample.append(comments.texts[i])
+                else:
+                    slot = self._random.randrange(self.seen[topic])
+                    if slot < self.max_comments_per_topic:
+                        sample[slot] = comments.texts[i]
+
+    def conclusions(self, conclusion_generator, batch_size=64, checkpoint=None, summarize_texts=None):
+        """
+        Returns (topic, effectiveness, summaries) per topic, in order of first appearance.
+        checkpoint and summarize_texts are passed to ConclusionGenerator.summarize_groups.
+        """
+        with timed_stage('conclusions', sum(len(sample) for sample in self.samples.values())):
+            summaries = conclusion_generator.summarize_groups(self.samples, batch_size, checkpoint, summarize_texts)
+        return [
+            (topic, TopicEffectivenessClassifier.classify_type_counts(counts), summaries[topic])
+            for topic, counts in self.type_counts.items()
+        ]
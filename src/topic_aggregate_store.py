@@ -0,0 +1,128 @@
+# topic_aggregate_store.py
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from topic_effectiveness_classifier import TopicEffectivenessClassifier
+
+_COLUMNS = ('claim', 'counterclaim', 'rebuttal', 'evidence')
+
+
+class TopicAggregateStore:
+    LABELS = ('Claim', 'Counterclaim', 'Rebuttal', 'Evidence')
+
+    def __init__(self, path='cache/topic_aggregates.sqlite', bucket_seconds=3600, retention_seconds=None):
+        """
+        Persistent per-topic opinion type counters, updated as classified batches arrive, so
+        topic effectiveness is read without rescanning comments or rerunning any model.
+
+        Counts are kept twice: all-time totals per topic, read with one primary key lookup,
+        and per-topic time buckets of bucket_seconds that answer windowed queries.
+
+        Parameters:
+        - path: SQLite file; created if missing.
+        - bucket_seconds: Granularity of the time windows.
+        - retention_seconds: Buckets older than this are deleted as new counts arrive; the
+          all-time totals are kept. None keeps every bucket.
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.path = path
+        self.bucket_seconds = bucket_seconds
+        self.retention_seconds = retention_seconds
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+
+        counters = ', '.join(f'{column} INTEGER NOT NULL' for column in _COLUMNS)
+        self._db.execute(
+            f"CREATE TABLE IF NOT EXISTS totals (topic TEXT PRIMARY KEY, {counters}, updated REAL NOT NULL)"
+        )
+        self._db.execute(
+            f"CREATE TABLE IF NOT EXISTS buckets (topic TEXT NOT NULL, bucket INTEGER NOT NULL, {counters}, "
+            "PRIMARY KEY (topic, bucket))"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS buckets_bucket ON buckets (bucket)")
+        self._db.commit()
+        logging.info(f"Topic aggregates opened at {path}.")
+
+    def add(self, comments, timestamp=None):
+        """
+        Adds the opinion types of a ClassifiedComments batch to its topics' counters. Comments
+        without a topic or type are not counted; collapsed clusters count once per member.
+        """
+        if not len(comments):
+            return
+
+        matrix = comments.type_count_matrix()
+        columns = [comments.types.index(label) if label in comments.types else None for label in self.LABELS]
+        rows = []
+        for topic, counts in zip(comments.topics, matrix):
+            values = [int(counts[column]) if column is not None else 0 for column in columns]
+            if any(values):
+                rows.append((topic, *values))
+        if not rows:
+            return
+
+        timestamp = time.time() if timestamp is None else timestamp
+        bucket = int(timestamp // self.bucket_seconds)
+        increments = ', '.join(f'{column} = {column} + excluded.{column}' for column in _COLUMNS)
+
+        with self._lock, self._db:
+            self._db.executemany(
+                f"INSERT INTO totals VALUES (?, ?, ?, ?, ?, ?) "
+                f"ON CONFLICT (topic) DO UPDATE SET {increments}, updated = excluded.updated",
+                [(*row, timestamp) for row in rows]
+            )
+            self._db.executemany(
+                f"INSERT INTO buckets VALUES (?, ?, ?, ?, ?, ?) "
+                f"ON CONFLICT (topic, bucket) DO UPDATE SET {increments}",
+                [(row[0], bucket, *row[1:]) for row in rows]
+            )
+            if self.retention_seconds is not None:
+                oldest = int((timestamp - self.retention_seconds) // self.bucket_seconds)
+                self._db.execute("DELETE FROM buckets WHERE bucket < ?", (oldest,))
+
+    def query(self, topics, window_seconds=None, now=None):
+        """
+        Returns {topic: (effectiveness, {label: count})} for every topic in topics; unknown
+        topics get zero counts. With window_seconds, only counts of the buckets overlapping the
+        last window_seconds are included, so the window is widened to whole buckets.
+        """
+        topics = list(dict.fromkeys(topics))
+        counts = {topic: (0,) * len(_COLUMNS) for topic in topics}
+        if window_seconds is not None:
+            now = time.time() if now is None else now
+            oldest = int((now - window_seconds) // self.bucket_seconds)
+
+        with self._lock:
+            # Chunked, since SQLite limits the number of bound variables per statement.
+            for i in range(0, len(topics), 500):
+                part = topics[i:i + 500]
+                placeholders = ', '.join('?' * len(part))
+                if window_seconds is None:
+                    rows = self._db.execute(
+                        f"SELECT topic, {', '.join(_COLUMNS)} FROM totals WHERE topic IN ({placeholders})", part
+                    ).fetchall()
+                else:
+                    rows = self._db.execute(
+                        f"SELECT topic, {', '.join(f'SUM({column})' for column in _COLUMNS)} FROM buckets "
+                        f"WHERE topic IN ({placeholders}) AND bucket >= ? GROUP BY topic", (*part, oldest)
+                    ).fetchall()
+                for topic, *values in rows:
+                    counts[topic] = values
+
+        results = {}
+        for topic, values in counts.items():
+            type_counts = dict(zip(self.LABELS, values))
+            results[topic] = (TopicEffectivenessClassifier.classify_type_counts(type_counts), type_counts)
+        return results
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
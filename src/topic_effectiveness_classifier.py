@@ -1,6 +1,13 @@
 # topic_effectiveness_classifier.py
 
+from collections import Counter
+
+import numpy as np
+
+
 class TopicEffectivenessClassifier:
+    _BY_SIGN = {1: "Effective", 0: "Adequate", -1: "Ineffective"}
+
     @staticmethod
     def classify_topic_effectiveness(comments):
         if not isinstance(comments, list):
@@ -10,8 +17,29 @@ class TopicEffectivenessClassifier:
             if not isinstance(comment, dict) or 'type' not in comment:
                 raise ValueError("Each comment must be a dictionary with a 'type' key.")
 
-        claim_count = sum(1 for c in comments if c.get('type') == 'Claim')
-        counter_count = sum(1 for c in comments if c.get('type') in ['Counterclaim', 'Rebuttal'])
+        # Collapsed near-duplicate clusters count once per member.
+        type_counts = Counter()
+        for comment in comments:
+            type_counts[comment.get('type')] += comment.get('count', 1)
+
+        return TopicEffectivenessClassifier.classify_type_counts(type_counts)
+
+    @staticmethod
+    def classify_type_count_matrix(matrix, types):
+        """
+        Vectorized classify_type_counts for a (topics x types) count matrix whose columns are
+        named by types. Returns one effectiveness per row.
+        """
+        def column(name):
+            return matrix[:, types.index(name)] if name in types else 0
+
+        balance = np.sign(column('Claim') - column('Counterclaim') - column('Rebuttal'))
+        return [TopicEffectivenessClassifier._BY_SIGN[int(sign)] for sign in np.broadcast_to(balance, len(matrix))]
+
+    @staticmethod
+    def classify_type_counts(type_counts):
+        claim_count = type_counts.get('Claim', 0)
+        counter_count = type_counts.get('Counterclaim', 0) + type_counts.get('Rebuttal', 0)
 
         if claim_count > counter_count:
             return "Effective"
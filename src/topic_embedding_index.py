@@ -0,0 +1,105 @@
+# topic_embedding_index.py
+
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+class TopicEmbeddingIndex:
+    def __init__(self, load_model, model_name, cache_dir='cache/topic_index', max_in_memory=32,
+                 max_disk_bytes=256 << 20):
+        """
+        Keeps normalized topic embeddings keyed by a content hash of the topic list.
+
+        Parameters:
+        - load_model: Callable returning the SentenceTransformer; only called on a cache miss.
+        - model_name: Name of the embedding model, mixed into the hash so indexes never cross models.
+        - cache_dir: Directory where built indexes are persisted as .npy files.
+        - max_in_memory: Topic sets kept mapped in memory; the least recently used is dropped.
+        - max_disk_bytes: Size bound of cache_dir; the least recently used files are deleted
+          beyond it.
+        """
+        self.load_model = load_model
+        self.model_name = model_name
+        self.cache_dir = cache_dir
+        self.max_in_memory = max_in_memory
+        self.max_disk_bytes = max_disk_bytes
+        self._embeddings = OrderedDict()
+        self._lock = threading.Lock()
+
+    def topic_hash(self, topics):
+        digest = hashlib.sha256(self.model_name.encode('utf-8'))
+        for topic in topics:
+            encoded = topic.encode('utf-8')
+            digest.update(len(encoded).to_bytes(8, 'little'))
+            digest.update(encoded)
+        return digest.hexdigest()
+
+    def get_embeddings(self, topics):
+        key = self.topic_hash(topics)
+
+        with self._lock:
+            embeddings = self._embeddings.get(key)
+            if embeddings is None:
+                embeddings = self._load_or_build(key, topics)
+                self._embeddings[key] = embeddings
+                while len(self._embeddings) > self.max_in_memory:
+                    self._embeddings.popitem(last=False)
+            self._embeddings.move_to_end(key)
+
+        return key, embeddings
+
+    def _load_or_build(self, key, topics):
+        path = os.path.join(self.cache_dir, f'{key}.npy')
+
+        if os.path.exists(path):
+            logging.info(f"Loading topic index {key[:12]} from {path}...")
+            os.utime(path)  # Marks the file as recently used for _prune_disk.
+            return np.load(path, mmap_mode='r')
+
+        logging.info(f"Building topic index {key[:12]} for {len(topics)} topics...")
+        embeddings = np.asarray(
+            self.load_model().encode(topics, convert_to_numpy=True), dtype=np.float32
+        )
+        embeddings /= np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.save(f, embeddings)
+        os.replace(tmp_path, path)
+
+        logging.info(f"Topic index saved to {path}.")
+        self._prune_disk(keep=path)
+        return np.load(path, mmap_mode='r')
+
+    def _prune_disk(self, keep):
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith('.npy'):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_disk_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                # Indexes still mapped by this or another process stay readable until unmapped.
+                os.remove(path)
+                total -= size
+                logging.info(f"Evicted topic index {path}.")
+            except FileNotFoundError:
+                pass
+
@@ -0,0 +1,164 @@
+# topic_search.py
+
+import logging
+import math
+
+from compute_backend import get_backend
+
+
+class TopicSearchEngine:
+    MODES = ('exact', 'ann')
+
+    def __init__(self, mode='exact', comment_block_size=4096, topic_block_size=8192,
+                 n_clusters=None, n_probe=8, kmeans_iterations=10, min_topics_for_ann=1024, seed=0):
+        """
+        Top-k nearest-topic search over normalized embeddings.
+
+        Parameters:
+        - mode: 'exact' for blocked brute-force search, 'ann' for a clustered (IVF) index.
+        - comment_block_size: Number of comments scored at once.
+        - topic_block_size: Number of topics scored at once in exact mode.
+        - n_clusters: Number of partitions of the ANN index (defaults to sqrt of the topic count).
+        - n_probe: Number of partitions searched per comment in ANN mode.
+        - kmeans_iterations: Iterations used to build the ANN partitions.
+        - min_topics_for_ann: Below this many topics ANN mode falls back to exact search.
+        - seed: Seed for the partition initialization.
+        """
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown topic search mode: {mode}. Expected one of {self.MODES}.")
+
+        self.mode = mode
+        self.comment_block_size = comment_block_size
+        self.topic_block_size = topic_block_size
+        self.n_clusters = n_clusters
+        self.n_probe = n_probe
+        self.kmeans_iterations = kmeans_iterations
+        self.min_topics_for_ann = min_topics_for_ann
+        self.seed = seed
+        self._ann_index = None
+        self.xp = get_backend().xp
+
+    def search(self, queries, topics, k=1, index_key=None):
+        """
+        Returns (scores, indices) arrays of shape (len(queries), k), best match first.
+        Slots without a candidate hold a score of -inf and an index of -1.
+        """
+        xp = self.xp
+        k = max(1, min(k, topics.shape[0]))
+
+        use_ann = self.mode == 'ann' and topics.shape[0] >= self.min_topics_for_ann
+        if use_ann:
+            index = self._get_ann_index(topics, index_key)
+
+        scores = xp.empty((queries.shape[0], k), dtype=xp.float32)
+        indices = xp.empty((queries.shape[0], k), dtype=xp.int64)
+
+        for start in range(0, queries.shape[0], self.comment_block_size):
+            block = queries[start:start + self.comment_block_size]
+            if use_ann:
+                block_scores, block_indices = self._search_ann(block, index, k)
+            else:
+                block_scores, block_indices = self._search_exact(block, topics, k)
+            scores[start:start + block.shape[0]] = block_scores
+            indices[start:start + block.shape[0]] = block_indices
+
+        order = xp.argsort(-scores, axis=1)
+        return xp.take_along_axis(scores, order, axis=1), xp.take_along_axis(indices, order, axis=1)
+
+    def _search_exact(self, queries, topics, k):
+        xp = self.xp
+        best_scores, best_indices = self._empty_topk(queries.shape[0], k)
+
+        for start in range(0, topics.shape[0], self.topic_block_size):
+            block = topics[start:start + self.topic_block_size]
+            block_ids = xp.arange(start, start + block.shape[0], dtype=xp.int64)
+            best_scores, best_indices = self._merge_topk(
+                best_scores, best_indices, xp.matmul(queries, block.T), block_ids, k
+            )
+
+        return best_scores, best_indices
+
+    def _search_ann(self, queries, index, k):
+        xp = self.xp
+        centroids, sorted_embeddings, sorted_ids, offsets = index
+        n_probe = min(self.n_probe, centroids.shape[0])
+
+        centroid_scores = xp.matmul(queries, centroids.T)
+        if n_probe < centroids.shape[0]:
+            probes = xp.argpartition(-centroid_scores, n_probe - 1, axis=1)[:, :n_probe]
+        else:
+            probes = xp.broadcast_to(xp.arange(centroids.shape[0]), centroid_scores.shape)
+
+        best_scores, best_indices = self._empty_topk(queries.shape[0], k)
+
+        for cluster in range(centroids.shape[0]):
+            begin, end = offsets[cluster], offsets[cluster + 1]
+            if begin == end:
+                continue
+
+            rows = xp.nonzero((probes == cluster).any(axis=1))[0]
+            if rows.size == 0:
+                continue
+
+            cluster_scores = xp.matmul(queries[rows], sorted_embeddings[begin:end].T)
+            best_scores[rows], best_indices[rows] = self._merge_topk(
+                best_scores[rows], best_indices[rows], cluster_scores, sorted_ids[begin:end], k
+            )
+
+        return best_scores, best_indices
+
+    def _get_ann_index(self, topics, index_key):
+        if self._ann_index is not None and index_key is not None and self._ann_index[0] == index_key:
+            return self._ann_index[1]
+
+        index = self._build_ann_index(topics)
+        self._ann_index = (index_key, index)
+        return index
+
+    def _build_ann_index(self, topics):
+        xp = self.xp
+        n_topics = topics.shape[0]
+        n_clusters = min(self.n_clusters or max(1, int(math.sqrt(n_topics))), n_topics)
+        logging.info(f"Building ANN topic index with {n_clusters} partitions over {n_topics} topics...")
+
+        random_state = xp.random.RandomState(self.seed)
+        centroids = topics[random_state.choice(n_topics, n_clusters, replace=False)].copy()
+
+        for _ in range(self.kmeans_iterations):
+            assignments = self._assign(topics, centroids)
+            sums = xp.zeros_like(centroids)
+            xp.add.at(sums, assignments, topics)
+            norms = xp.linalg.norm(sums, axis=1, keepdims=True)
+            # Empty partitions keep their previous centroid.
+            centroids = xp.where(norms > 0, sums / xp.maximum(norms, 1e-12), centroids)
+
+        assignments = self._assign(topics, centroids)
+        order = xp.argsort(assignments)
+        counts = xp.bincount(assignments, minlength=n_clusters).tolist()
+        offsets = [0]
+        for count in counts:
+            offsets.append(offsets[-1] + count)
+
+        return centroids, topics[order], order.astype(xp.int64), offsets
+
+    def _assign(self, topics, centroids):
+        xp = self.xp
+        assignments = xp.empty(topics.shape[0], dtype=xp.int64)
+        for start in range(0, topics.shape[0], self.topic_block_size):
+            block = topics[start:start + self.topic_block_size]
+            assignments[start:start + block.shape[0]] = xp.argmax(xp.matmul(block, centroids.T), axis=1)
+        return assignments
+
+    def _empty_topk(self, n, k):
+        xp = self.xp
+        return (
+            xp.full((n, k), -xp.inf, dtype=xp.float32),
+            xp.full((n, k), -1, dtype=xp.int64),
+        )
+
+    def _merge_topk(self, best_scores, best_indices, block_scores, block_ids, k):
+        xp = self.xp
+        scores = xp.concatenate([best_scores, block_scores.astype(xp.float32)], axis=1)
+        ids = xp.concatenate([best_indices, xp.broadcast_to(block_ids, block_scores.shape)], axis=1)
+        top = xp.argpartition(-scores, k - 1, axis=1)[:, :k]
+        return xp.take_along_axis(scores, top, axis=1), xp.take_along_axis(ids, top, axis=1)
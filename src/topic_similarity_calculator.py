@@ -2,40 +2,128 @@
 
 import logging
 
-import cupy as cp
-
+import numpy as np
 from sentence_transformers import SentenceTransformer
 
+from compute_backend import get_backend
 from gpu_resource_manager import GPUResourceManager
+from metrics import timed_stage
+from model_registry import get_model
+from quantization import load_quantized
+from topic_embedding_index import TopicEmbeddingIndex
+from topic_search import TopicSearchEngine
 
 
 class TopicSimilarityCalculator:
-    def __init__(self):
-        logging.info("Loading sentence embedding model on CUDA...")
-        self.embedding_model = SentenceTransformer(
-            'sentence-transformers/all-MiniLM-L6-v2', device='cuda'
-        ).to('cuda')
+    MODEL_NAME = 'sentence-transformers/all-MiniLM-L6-v2'
+
+    def __init__(self, index_cache_dir='cache/topic_index', search_mode='exact', min_similarity=None,
+                 result_cache=None, quantize=False, **search_options):
+        """
+        Parameters:
+        - index_cache_dir: Directory of the persisted topic embedding indexes.
+        - search_mode: 'exact' or 'ann', see TopicSearchEngine.
+        - min_similarity: Matches scoring below this cosine similarity are dropped, so
+          off-topic comments get no topic. None keeps every best match.
+        - result_cache: Optional ResultCache reused for comment embeddings.
+        - quantize: Run the embedding model with int8 dynamic quantization (CPU only).
+        - search_options: Extra TopicSearchEngine options (block sizes, n_clusters, n_probe...).
+        """
+        self.backend = get_backend()
+        self.quantize = quantize
+        self.cache_config = f"{self.MODEL_NAME}|int8" if quantize else self.MODEL_NAME
+        self.topic_index = TopicEmbeddingIndex(lambda: self.embedding_model, self.cache_config, index_cache_dir)
+        self.search_engine = TopicSearchEngine(mode=search_mode, **search_options)
+        self.min_similarity = min_similarity
+        self.result_cache = result_cache
+        self._device_topic_embeddings = {}
+
+    @property
+    def embedding_model(self):
+        device = self.backend.device
+        if self.quantize:
+            return get_model(
+                ('sentence-transformer', self.MODEL_NAME, 'int8'),
+                lambda: load_quantized(self.MODEL_NAME, lambda: SentenceTransformer(self.MODEL_NAME, device='cpu'))
+            )
+        return get_model(
+            ('sentence-transformer', self.MODEL_NAME, device),
+            lambda: SentenceTransformer(self.MODEL_NAME, device=device).to(device)
+        )
+
+    def load(self):
+        self.embedding_model
+
+    def get_topic_embeddings(self, topics):
+        key, embeddings = self.topic_index.get_embeddings(topics)
+
+        device_embeddings = self._device_topic_embeddings.get(key)
+        if device_embeddings is None:
+            # Only the most recent topic set stays resident on the device.
+            self._device_topic_embeddings.clear()
+            device_embeddings = self.backend.asarray(embeddings)
+            self._device_topic_embeddings[key] = device_embeddings
+
+        return key, device_embeddings
+
+    def encode_comments(self, comments):
+        """
+        Returns normalized comment embeddings as a backend (NumPy or CuPy) array.
+        """
+        with timed_stage('embed', len(comments)):
+            if self.result_cache is None:
+                return self._encode(comments)
+
+            rows = self.result_cache.get_or_compute(
+                'embedding', comments, self.cache_config,
+                # Copies, so a cached row does not keep its whole batch's array alive.
+                lambda indices: [
+                    row.copy() for row in self.backend.asnumpy(self._encode([comments[i] for i in indices]))
+                ]
+            )
+            return self.backend.asarray(np.stack(rows))
 
-    def get_topics_by_similarity_batch(self, comments, topics):
-        logging.info(f"Calculating topic similarity for batch of {len(comments)} comments...")
+    def _encode(self, comments):
+        xp = self.backend.xp
+        embeddings = self.embedding_model.encode(
+            comments, convert_to_tensor=self.backend.is_gpu, convert_to_numpy=not self.backend.is_gpu
+        )
+        embeddings = self.backend.asarray(embeddings)
+        embeddings /= xp.maximum(xp.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+        return embeddings
 
-        comment_embeddings = self.embedding_model.encode(comments, convert_to_tensor=True)
-        topic_embeddings = self.embedding_model.encode(topics, convert_to_tensor=True)
+    def search_topics_batch(self, comments, topics, k=1, comment_embeddings=None):
+        """
+        Returns, for each comment, a list of up to k (topic, score) pairs, best first.
+        Pairs below min_similarity are left out, so a comment may get an empty list.
+        comment_embeddings may be passed in when the caller already has them from encode_comments.
+        """
+        with timed_stage('topic_match', len(comments)):
+            logging.info(f"Calculating topic similarity for batch of {len(comments)} comments...")
 
-        try:
-            comment_embeddings_cp = cp.asarray(comment_embeddings)
-            topic_embeddings_cp = cp.asarray(topic_embeddings)
+            if comment_embeddings is None:
+                comment_embeddings = self.encode_comments(comments)
+            key, topic_embeddings = self.get_topic_embeddings(topics)
 
-            comment_embeddings_cp /= cp.linalg.norm(comment_embeddings_cp, axis=1, keepdims=True)
-            topic_embeddings_cp /= cp.linalg.norm(topic_embeddings_cp, axis=1, keepdims=True)
+            try:
+                scores, indices = self.search_engine.search(
+                    comment_embeddings, topic_embeddings, k=k, index_key=key
+                )
+                scores, indices = self.backend.asnumpy(scores), self.backend.asnumpy(indices)
+            finally:
+                GPUResourceManager.clear_gpu_memory()
 
-            similarities = cp.matmul(comment_embeddings_cp, topic_embeddings_cp.T)
-            closest_topic_indices = cp.argmax(similarities, axis=1)
+            result = []
+            for row_scores, row_indices in zip(scores, indices):
+                result.append([
+                    (topics[idx], float(score))
+                    for score, idx in zip(row_scores, row_indices)
+                    if idx >= 0 and (self.min_similarity is None or score >= self.min_similarity)
+                ])
 
-            result = [topics[idx] for idx in closest_topic_indices.get()]
-        finally:
-            del comment_embeddings_cp, topic_embeddings_cp, similarities, closest_topic_indices
-            GPUResourceManager.clear_gpu_memory()
+            logging.info("Topic similarity calculation completed.")
+            return result
 
-        logging.info("Topic similarity calculation completed.")
-        return result
+    def get_topics_by_similarity_batch(self, comments, topics, comment_embeddings=None):
+        matches = self.search_topics_batch(comments, topics, k=1, comment_embeddings=comment_embeddings)
+        return [topic_matches[0][0] if topic_matches else None for topic_matches in matches]
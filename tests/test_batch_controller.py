@@ -0,0 +1,94 @@
+# test_batch_controller.py
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from batch_controller import AdaptiveBatchController, is_out_of_memory  # noqa: E402
+
+
+class _StubModel:
+    def __init__(self, oom_above=None, bytes_per_item=0, message="DefaultCPUAllocator: not enough memory"):
+        """
+        Stand-in for a model call: touches bytes_per_item of fresh memory per item and raises an
+        allocator error for batches of more than oom_above items.
+        """
+        self.oom_above = oom_above
+        self.bytes_per_item = bytes_per_item
+        self.message = message
+        self.sizes = []
+
+    def __call__(self, items):
+        self.sizes.append(len(items))
+        if self.oom_above is not None and len(items) > self.oom_above:
+            raise RuntimeError(self.message)
+        if self.bytes_per_item:
+            buffer = bytearray(len(items) * self.bytes_per_item)
+            for i in range(0, len(buffer), 4096):
+                buffer[i] = 1
+        return [item * 2 for item in items]
+
+
+def _run(controller, items, model):
+    outputs = []
+    start = 0
+    while start < len(items):
+        batch = items[start:start + controller.batch_size]
+        outputs.extend(controller.call(batch, model))
+        start += len(batch)
+    return outputs
+
+
+class IsOutOfMemoryTest(unittest.TestCase):
+    def test_allocator_messages(self):
+        for message in (
+            "CUDA out of memory. Tried to allocate 2.00 GiB",
+            "DefaultCPUAllocator: not enough memory: you tried to allocate 1073741824 bytes.",
+            "DefaultCPUAllocator: can't allocate memory: you tried to allocate 1073741824 bytes.",
+            "[enforce fail at alloc_cpu.cpp:114] Cannot allocate memory",
+        ):
+            self.assertTrue(is_out_of_memory(RuntimeError(message)), message)
+        self.assertTrue(is_out_of_memory(MemoryError()))
+
+    def test_other_errors(self):
+        self.assertFalse(is_out_of_memory(RuntimeError("shape mismatch")))
+        self.assertFalse(is_out_of_memory(ValueError("out of memory")))
+
+
+class AdaptiveBatchControllerTest(unittest.TestCase):
+    def test_splits_batches_that_run_out_of_memory(self):
+        model = _StubModel(oom_above=100)
+        controller = AdaptiveBatchController('test', 32, memory_budget=0)
+        items = list(range(2000))
+
+        self.assertEqual(_run(controller, items, model), [item * 2 for item in items])
+        self.assertLessEqual(controller.maximum, 100)
+        self.assertLessEqual(controller.batch_size, 100)
+        self.assertFalse(controller.probing)
+
+    def test_single_item_that_does_not_fit_raises(self):
+        controller = AdaptiveBatchController('test', 4)
+        with self.assertRaises(RuntimeError):
+            controller.call([1], _StubModel(oom_above=0))
+
+    def test_other_errors_are_not_split(self):
+        model = _StubModel(oom_above=0, message="shape mismatch")
+        with self.assertRaises(RuntimeError):
+            AdaptiveBatchController('test', 8).call(list(range(8)), model)
+        self.assertEqual(model.sizes, [8])
+
+    def test_memory_budget_limits_growth(self):
+        model = _StubModel(bytes_per_item=1 << 20)
+        controller = AdaptiveBatchController('test', 8, memory_budget=40 << 20)
+        items = list(range(1000))
+
+        self.assertEqual(_run(controller, items, model), [item * 2 for item in items])
+        self.assertGreater(controller.bytes_per_item, 0)
+        self.assertLessEqual(controller.batch_size, 40)
+        self.assertLessEqual(max(model.sizes), 40)
+
+
+if __name__ == '__main__':
+    unittest.main()